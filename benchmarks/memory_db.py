@@ -0,0 +1,384 @@
+"""
+An in-memory stand-in for the parts of a motor database
+that utils.db.Document uses, for benchmarks.
+
+Every call that would be a round trip to MongoDB is counted,
+as are the documents each query had to examine. Single field
+indexes created through ``create_index`` are kept as sorted
+lists, so indexed range queries examine only what they return,
+like they would on a real server.
+"""
+
+import bisect
+import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+
+from utils.query import (
+    apply_update,
+    is_operator,
+    matches,
+    project,
+    sort_documents,
+    upsert_document,
+)
+
+__all__ = ["MemoryDatabase", "MemoryCollection"]
+
+# The server sends 101 documents first, then up to 16MiB per getMore
+FIRST_BATCH_SIZE = 101
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+
+def _stored(value: Any) -> Any:
+    """`value` as the server stores it, BSON keeps datetimes to the millisecond."""
+    if isinstance(value, datetime.datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {k: _stored(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_stored(v) for v in value]
+    return value
+
+
+class _Result:
+    """Quacks like the pymongo result classes."""
+
+    def __init__(self, **kwargs):
+        self.acknowledged = True
+        self.__dict__.update(kwargs)
+
+
+class _SortedIndex:
+    def __init__(self, field: str):
+        self.field = field
+        self.entries: List[Tuple[Any, Any]] = []
+
+    def add(self, document: Dict[str, Any]) -> None:
+        if document.get(self.field) is not None:
+            bisect.insort(self.entries, (document[self.field], document["_id"]))
+
+    def remove(self, document: Dict[str, Any]) -> None:
+        if document.get(self.field) is None:
+            return
+        entry = (document[self.field], document["_id"])
+        index = bisect.bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+
+    def candidates(self, condition: Any) -> Optional[List[Any]]:
+        """The _id's that may match `condition`, or None if it can't be used."""
+        if not is_operator(condition):
+            condition = {"$gte": condition, "$lte": condition}
+        bounds = set(condition) & {"$lt", "$lte", "$gt", "$gte"}
+        if not bounds:
+            return None
+
+        entries = self.entries
+        start, end = 0, len(entries)
+        if "$gte" in condition:
+            start = bisect.bisect_left(entries, (condition["$gte"],))
+        if "$gt" in condition:
+            start = max(start, self._after(condition["$gt"]))
+        if "$lte" in condition:
+            end = self._after(condition["$lte"])
+        if "$lt" in condition:
+            end = min(end, bisect.bisect_left(entries, (condition["$lt"],)))
+        return [_id for _, _id in entries[start:end]]
+
+    def _after(self, value: Any) -> int:
+        index = bisect.bisect_right(self.entries, (value,))
+        while index < len(self.entries) and self.entries[index][0] == value:
+            index += 1
+        return index
+
+
+class MemoryCursor:
+    def __init__(self, collection, filter_dict, projection=None, **kwargs):
+        self._collection = collection
+        self._filter = filter_dict or {}
+        self._projection = projection
+        self._sort = kwargs.get("sort")
+        self._skip = kwargs.get("skip", 0)
+        self._limit = kwargs.get("limit", 0)
+        self._batch_size = kwargs.get("batch_size", 0)
+        self._results: Optional[List[Dict[str, Any]]] = None
+        self._position = 0
+        self._batches = 0
+
+    def sort(self, key, direction: int = 1):
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        self._batch_size = batch_size
+        return self
+
+    def _execute(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            documents = self._collection._query(self._filter)
+            if self._sort:
+                sort_documents(documents, self._sort)
+            documents = documents[self._skip :]
+            if self._limit:
+                documents = documents[: self._limit]
+            self._results = [project(d, self._projection) for d in documents]
+            self._collection.stats["round_trips"] += 1
+            self._batches = 1
+        return self._results
+
+    def _fetch_through(self, position: int) -> None:
+        """Count the getMores needed to have read up to `position`."""
+        first = self._batch_size or FIRST_BATCH_SIZE
+        if position < first:
+            return
+        rest = self._batch_size
+        if not rest:
+            size = len(bson.encode(self._results[0]))
+            rest = max(1, MAX_BATCH_BYTES // size)
+        needed = 2 + (position - first) // rest
+        if needed > self._batches:
+            self._collection.stats["round_trips"] += needed - self._batches
+            self._batches = needed
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = self._execute()
+        batch = results[self._position :]
+        if length:
+            batch = batch[:length]
+        self._position += len(batch)
+        if batch:
+            self._fetch_through(self._position - 1)
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        results = self._execute()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        self._fetch_through(self._position)
+        self._position += 1
+        return results[self._position - 1]
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: Dict[Any, Dict[str, Any]] = {}
+        self._indexes: Dict[str, _SortedIndex] = {}
+        self.stats = {"round_trips": 0, "examined": 0}
+
+    def reset_stats(self) -> None:
+        self.stats = {"round_trips": 0, "examined": 0}
+
+    def load(self, documents: Iterable[Dict[str, Any]]) -> None:
+        """Bulk load documents without counting round trips."""
+        for document in documents:
+            self._documents[document["_id"]] = _stored(document)
+        for index in self._indexes.values():
+            index.entries = sorted(
+                (d[index.field], d["_id"])
+                for d in self._documents.values()
+                if d.get(index.field) is not None
+            )
+
+    # <-- Reads -->
+    def find(self, filter_dict=None, projection=None, **kwargs) -> MemoryCursor:
+        return MemoryCursor(self, filter_dict, projection, **kwargs)
+
+    async def find_one(self, filter_dict=None, projection=None, **kwargs):
+        results = await self.find(filter_dict, projection, limit=1, **kwargs).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, filter_dict: Dict[str, Any]) -> int:
+        self.stats["round_trips"] += 1
+        return len(self._query(filter_dict))
+
+    def _query(self, filter_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+        ids = self._candidate_ids(filter_dict)
+        if ids is None:
+            candidates = list(self._documents.values())
+        else:
+            candidates = [self._documents[i] for i in ids if i in self._documents]
+        self.stats["examined"] += len(candidates)
+        return [d for d in candidates if matches(d, filter_dict)]
+
+    def _candidate_ids(self, filter_dict: Dict[str, Any]) -> Optional[List[Any]]:
+        if "_id" in filter_dict:
+            condition = filter_dict["_id"]
+            if not is_operator(condition):
+                return [condition]
+            if "$in" in condition:
+                return list(dict.fromkeys(condition["$in"]))
+
+        for field, index in self._indexes.items():
+            if field in filter_dict:
+                ids = index.candidates(filter_dict[field])
+                if ids is not None:
+                    return ids
+
+        for condition in filter_dict.get("$and", ()):
+            ids = self._candidate_ids(condition)
+            if ids is not None:
+                return ids
+        return None
+
+    # <-- Writes -->
+    async def insert_one(self, document: Dict[str, Any]) -> _Result:
+        self.stats["round_trips"] += 1
+        self._insert(document)
+        return _Result(inserted_id=document["_id"])
+
+    async def insert_many(self, documents: List[Dict[str, Any]], **kwargs) -> _Result:
+        self.stats["round_trips"] += 1
+        for document in documents:
+            self._insert(document)
+        return _Result(inserted_ids=[d["_id"] for d in documents])
+
+    async def update_one(self, filter_dict, update, upsert=False, **kwargs):
+        self.stats["round_trips"] += 1
+        return self._update(filter_dict, update, upsert, many=False)
+
+    async def update_many(self, filter_dict, update, upsert=False, **kwargs):
+        self.stats["round_trips"] += 1
+        return self._update(filter_dict, update, upsert, many=True)
+
+    async def delete_one(self, filter_dict, **kwargs) -> _Result:
+        self.stats["round_trips"] += 1
+        return _Result(deleted_count=self._delete(filter_dict, many=False))
+
+    async def delete_many(self, filter_dict, **kwargs) -> _Result:
+        self.stats["round_trips"] += 1
+        return _Result(deleted_count=self._delete(filter_dict, many=True))
+
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs) -> _Result:
+        self.stats["round_trips"] += 1
+        counts = dict.fromkeys(
+            ("inserted_count", "matched_count", "modified_count", "deleted_count"), 0
+        )
+        upserted_ids = {}
+        for index, request in enumerate(requests):
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                self._insert(request._doc)
+                counts["inserted_count"] += 1
+            elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                update = request._doc
+                if kind == "ReplaceOne":
+                    update = {"$set": update}
+                result = self._update(
+                    request._filter, update, request._upsert, kind == "UpdateMany"
+                )
+                counts["matched_count"] += result.matched_count
+                counts["modified_count"] += result.modified_count
+                if result.upserted_id is not None:
+                    upserted_ids[index] = result.upserted_id
+            elif kind in ("DeleteOne", "DeleteMany"):
+                counts["deleted_count"] += self._delete(
+                    request._filter, kind == "DeleteMany"
+                )
+        return _Result(
+            upserted_count=len(upserted_ids), upserted_ids=upserted_ids, **counts
+        )
+
+    async def create_index(self, keys, **kwargs) -> str:
+        self.stats["round_trips"] += 1
+        return self._create_index(keys, **kwargs)
+
+    async def create_indexes(self, models, **kwargs) -> List[str]:
+        self.stats["round_trips"] += 1
+        return [
+            self._create_index(list(model.document["key"].items()), **model.document)
+            for model in models
+        ]
+
+    def _create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        if len(keys) == 1 and keys[0][0] not in self._indexes:
+            index = self._indexes[keys[0][0]] = _SortedIndex(keys[0][0])
+            for document in self._documents.values():
+                index.add(document)
+        return kwargs.get("name") or "_".join(f"{k}_{d}" for k, d in keys)
+
+    def watch(self, *args, **kwargs):
+        raise NotImplementedError("Change streams need a replica set")
+
+    def _insert(self, document: Dict[str, Any]) -> None:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        if document["_id"] in self._documents:
+            raise KeyError(f"Duplicate _id {document['_id']!r}")
+        stored = _stored(document)
+        self._documents[stored["_id"]] = stored
+        for index in self._indexes.values():
+            index.add(stored)
+
+    def _update(self, filter_dict, update, upsert, many) -> _Result:
+        documents = self._query(filter_dict)
+        if not many:
+            documents = documents[:1]
+
+        upserted_id = None
+        if not documents and upsert:
+            document = upsert_document(filter_dict, update)
+            self._insert(document)
+            upserted_id = document["_id"]
+
+        for document in documents:
+            for index in self._indexes.values():
+                index.remove(document)
+            apply_update(document, update)
+            for field, value in document.items():
+                document[field] = _stored(value)
+            for index in self._indexes.values():
+                index.add(document)
+
+        matched = len(documents)
+        return _Result(
+            matched_count=matched, modified_count=matched, upserted_id=upserted_id
+        )
+
+    def _delete(self, filter_dict, many) -> int:
+        documents = self._query(filter_dict)
+        if not many:
+            documents = documents[:1]
+        for document in documents:
+            del self._documents[document["_id"]]
+            for index in self._indexes.values():
+                index.remove(document)
+        return len(documents)
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        totals = {"round_trips": 0, "examined": 0}
+        for collection in self._collections.values():
+            for key, value in collection.stats.items():
+                totals[key] += value
+        return totals
+
+    def reset_stats(self) -> None:
+        for collection in self._collections.values():
+            collection.reset_stats()
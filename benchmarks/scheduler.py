@@ -0,0 +1,334 @@
+"""
+Benchmarks the reminder scheduler against synthetic reminder populations.
+
+For each population size this loads the reminders collection with a
+generated workload and measures, per scenario, the wall time, peak
+memory allocated, database round trips and documents examined:
+
+    legacy_scan     the old tick, ``get_all()`` then a Python time filter
+    scheduler_load  loading the in-memory schedule at startup
+    due_tick        one ``check_reminders`` tick with reminders due
+    idle_tick       one ``check_reminders`` tick with nothing due
+    backlog_drain   one ``drain_backlog`` pass over overdue reminders
+
+Results are written as JSON lines, one per scenario, after a header line
+describing the run, so runs can be diffed or loaded into a dataframe.
+With ``--backend sqlite`` the reminders live in a temporary SQLite file
+instead, and round trips count calls into the SQLite thread.
+
+Usage (from the repository root)::
+
+    python -m benchmarks.scheduler --sizes 1000,100000 --output bench.jsonl
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+import discord
+
+import cogs.module as module
+from benchmarks.memory_db import MemoryDatabase
+from utils.delivery import DeliveryPool
+from utils.sqlite import SQLiteDatabase
+
+UNLIMITED = 10**9
+
+
+class BenchChannel:
+    def __init__(self, bot, channel_id: int):
+        self.bot = bot
+        self.id = channel_id
+
+    async def send(self, **kwargs) -> None:
+        self.bot.sent += 1
+
+
+class BenchBot:
+    """Just enough of a bot for the Reminder cog to deliver to."""
+
+    default_color = 0x2B2D31
+    link_emoji = None
+    worker_id = 0
+    lease_owner = "bench"
+    change_streams = False
+    slow_query = None
+
+    def __init__(self, db):
+        self.db = db
+        self.sent = 0
+        self._ready = asyncio.Event()
+
+    async def wait_until_ready(self) -> None:
+        await self._ready.wait()
+
+    async def create_dm(self, user: discord.abc.Snowflake):
+        return SimpleNamespace(id=user.id)
+
+    def get_partial_messageable(self, channel_id: int, *, type=None) -> BenchChannel:
+        return BenchChannel(self, channel_id)
+
+
+def generate(
+    size: int,
+    now: datetime.datetime,
+    args: argparse.Namespace,
+    rng: random.Random,
+    due_ids: List[int],
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield `size` reminders: a share due right now, a share long
+    overdue, and the rest spread over the coming weeks with a spike
+    at the top of each hour. A share of reminders belongs to a small
+    pool of hot users with hundreds of reminders each.
+
+    The _id's of the reminders due now are appended to `due_ids`,
+    they are stamped with the current time right before the ticks
+    run since loading a large population takes a while.
+    """
+    hot_users = [rng.getrandbits(60) for _ in range(max(1, size // args.hot_size))]
+    for reminder_id in range(size):
+        roll = rng.random()
+        if roll < args.due:
+            due = now
+            due_ids.append(reminder_id)
+        elif roll < args.due + args.overdue:
+            due = now - datetime.timedelta(
+                seconds=rng.uniform(module.CATCH_UP_AFTER * 2, 7 * 86400)
+            )
+        else:
+            due = now + datetime.timedelta(seconds=rng.expovariate(1 / (7 * 86400)))
+            if rng.random() < args.top_of_hour:
+                due = due.replace(minute=0, second=0, microsecond=0)
+
+        if rng.random() < args.hot_share:
+            user = rng.choice(hot_users)
+        else:
+            user = rng.getrandbits(60)
+
+        yield {
+            "_id": reminder_id,
+            "time": due.replace(microsecond=due.microsecond // 1000 * 1000),
+            "message": "x" * rng.randint(10, 200),
+            "user": user,
+            "url": f"https://discord.com/channels/@me/1/{reminder_id}",
+        }
+
+
+async def measure(
+    scenario: str, size: int, db, bot: BenchBot, coro, trace: bool
+) -> Dict[str, Any]:
+    db.reset_stats()
+    sent = bot.sent
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "scenario": scenario,
+        "size": size,
+        "seconds": elapsed,
+        "peak_bytes": peak,
+        "messages_sent": bot.sent - sent,
+        "items": result,
+        **db.stats,
+    }
+
+
+async def legacy_scan(cog) -> int:
+    reminders = await cog.reminders.get_all()
+    now = datetime.datetime.utcnow()
+    return sum(1 for reminder in reminders if reminder.time < now)
+
+
+async def scheduler_load(cog) -> int:
+    await cog.scheduler.load(
+        cog.reminders.iter_all(
+            projection={"time": 1, "user": 1},
+            batch_size=module.SCHEDULE_BATCH_SIZE,
+        )
+    )
+    return len(cog.scheduler)
+
+
+async def tick(cog) -> int:
+    cog.due_backlog = True  # skip waiting on the scheduler
+    await cog.check_reminders()
+    return batch_total(cog, "due_batch_size")
+
+
+async def backlog_drain(cog) -> int:
+    await cog.drain_backlog()
+    return batch_total(cog, "backlog_batch_size")
+
+
+def batch_total(cog, name: str) -> int:
+    histogram = cog.metrics.histograms.get(name)
+    return int(histogram.total) if histogram else 0
+
+
+async def load(db, documents: Iterator[Dict[str, Any]]) -> None:
+    if isinstance(db, MemoryDatabase):
+        db["reminders"].load(documents)
+        return
+
+    while True:
+        chunk = list(itertools.islice(documents, 10_000))
+        if not chunk:
+            break
+        await db["reminders"].insert_many(chunk)
+
+
+async def run_size(size: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    if args.backend == "sqlite":
+        directory = tempfile.TemporaryDirectory()
+        db = SQLiteDatabase(os.path.join(directory.name, "bench.db"))
+    else:
+        db = MemoryDatabase()
+    try:
+        return await run_backend(db, size, args)
+    finally:
+        if args.backend == "sqlite":
+            db.close()
+            directory.cleanup()
+
+
+async def run_backend(
+    db, size: int, args: argparse.Namespace
+) -> List[Dict[str, Any]]:
+    bot = BenchBot(db)
+    cog = module.Reminder(bot)
+    for loop in (cog.check_reminders, cog.drain_backlog, cog.prefetch_dm_channels):
+        loop.cancel()
+    if not args.paced:
+        cog.delivery = DeliveryPool(
+            concurrency=module.DELIVERY_CONCURRENCY,
+            global_rate=UNLIMITED,
+            route_rate=UNLIMITED,
+        )
+        cog.dm_channels.pool = cog.delivery
+    module.BACKLOG_BATCH_INTERVAL = 0
+
+    await cog.cog_load()
+    rng = random.Random(args.seed)
+    due_ids: List[int] = []
+    await load(db, generate(size, datetime.datetime.utcnow(), args, rng, due_ids))
+
+    trace = not args.no_memory
+    results = [
+        await measure("legacy_scan", size, db, bot, legacy_scan(cog), trace),
+        await measure("scheduler_load", size, db, bot, scheduler_load(cog), trace),
+    ]
+
+    # Drain everything that is due now, one tick at a time, then
+    # measure a tick that finds nothing.
+    await db["reminders"].update_many(
+        {"_id": {"$in": due_ids}}, {"$set": {"time": datetime.datetime.utcnow()}}
+    )
+    while True:
+        cog.metrics.reset()
+        result = await measure("due_tick", size, db, bot, tick(cog), trace)
+        if not result["items"]:
+            result["scenario"] = "idle_tick"
+            results.append(result)
+            break
+        results.append(result)
+
+    cog.metrics.reset()
+    results.append(
+        await measure("backlog_drain", size, db, bot, backlog_drain(cog), trace)
+    )
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    output = open(args.output, "w") if args.output else sys.stdout
+    header = {
+        "benchmark": "scheduler",
+        "started": datetime.datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "discord.py": discord.__version__,
+        **{k: v for k, v in vars(args).items() if k != "output"},
+    }
+    output.write(json.dumps(header) + "\n")
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        for result in await run_size(size, args):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    if output is not sys.stdout:
+        output.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000,100000,1000000",
+        help="comma-separated population sizes",
+    )
+    parser.add_argument(
+        "--due", type=float, default=0.001, help="share due right now"
+    )
+    parser.add_argument(
+        "--overdue", type=float, default=0.01, help="share long overdue"
+    )
+    parser.add_argument(
+        "--top-of-hour",
+        type=float,
+        default=0.3,
+        help="share of future reminders due exactly on the hour",
+    )
+    parser.add_argument(
+        "--hot-share",
+        type=float,
+        default=0.2,
+        help="share of reminders owned by hot users",
+    )
+    parser.add_argument(
+        "--hot-size",
+        type=int,
+        default=1000,
+        help="population size per hot user",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--backend",
+        choices=("memory", "sqlite"),
+        default="memory",
+        help="where the reminders are stored",
+    )
+    parser.add_argument(
+        "--paced",
+        action="store_true",
+        help="keep Discord's rate limits on delivery",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip tracemalloc, which slows down timing",
+    )
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -3,6 +3,8 @@ from discord import app_commands
 from discord.ext import commands
 from typing import List
 
+from utils.db import Document, plan_stages
+
 
 @app_commands.user_install()
 @app_commands.allowed_installs(guilds=False, users=True)
@@ -105,6 +107,131 @@ class Dev(commands.GroupCog, name="dev", description="Dev commands"):
                 )
             )
 
+    @app_commands.command(name="metrics", description="Shows scheduler metrics")
+    @app_commands.check(is_dev)
+    async def metrics(self, interaction: discord.Interaction, reset: bool = False):
+        cog = self.bot.get_cog("reminder")
+        if cog is None:
+            return await interaction.response.send_message(
+                embed=discord.Embed(
+                    description="The reminder cog is not loaded",
+                    color=interaction.client.default_color,
+                ),
+                ephemeral=True,
+            )
+
+        embed = discord.Embed(
+            title="Scheduler metrics", color=interaction.client.default_color
+        )
+        counters = cog.metrics.counters
+        embed.description = "\n".join(
+            f"**{name}:** {counters.get(name, 0)}"
+            for name in ("delivered", "forbidden", "failed", "dropped")
+        )
+        for name, histogram in cog.metrics.histograms.items():
+            embed.add_field(
+                name=name,
+                value=(
+                    f"count: {histogram.count}\n"
+                    f"mean: {histogram.mean:.3f}\n"
+                    f"p50: {histogram.percentile(50):.3f}\n"
+                    f"p95: {histogram.percentile(95):.3f}\n"
+                    f"p99: {histogram.percentile(99):.3f}\n"
+                    f"max: {histogram.max:.3f}"
+                ),
+            )
+        if reset:
+            cog.metrics.reset()
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="queries", description="Shows database operation timings"
+    )
+    @app_commands.check(is_dev)
+    async def queries(self, interaction: discord.Interaction, reset: bool = False):
+        documents = [
+            value for value in vars(self.bot).values() if isinstance(value, Document)
+        ]
+
+        embed = discord.Embed(
+            title="Database operations", color=interaction.client.default_color
+        )
+        operations = sorted(
+            (
+                (document, name, stats)
+                for document in documents
+                for name, stats in document.stats.items()
+            ),
+            key=lambda item: item[2].latency.total,
+            reverse=True,
+        )
+        for document, name, stats in operations[:25]:
+            latency = stats.latency
+            embed.add_field(
+                name=f"{document.document_name}.{name}",
+                value=(
+                    f"calls: {stats.calls}\n"
+                    f"items: {stats.items}\n"
+                    f"errors: {stats.errors}\n"
+                    f"slow: {stats.slow}\n"
+                    f"mean: {latency.mean * 1000:.1f}ms\n"
+                    f"p95: {latency.percentile(95) * 1000:.1f}ms\n"
+                    f"max: {latency.max * 1000:.1f}ms"
+                ),
+            )
+        embed.description = (
+            f"Slowest total time first, {len(operations)} operations"
+            if operations
+            else "No operations have run yet"
+        )
+        if reset:
+            for document in documents:
+                document.reset_stats()
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(
+        name="explain", description="Explains the queries the bot has issued"
+    )
+    @app_commands.check(is_dev)
+    async def explain(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        documents = [
+            value for value in vars(self.bot).values() if isinstance(value, Document)
+        ]
+
+        embed = discord.Embed(
+            title="Query plans", color=interaction.client.default_color
+        )
+        scans = 0
+        for document in documents:
+            for filter_dict, sort in list(document.queries.values()):
+                if len(embed.fields) == 25:
+                    break
+                try:
+                    stages = plan_stages(await document.explain(filter_dict, sort))
+                except Exception as e:
+                    stages = [f"error: {e}"]
+                collscan = "COLLSCAN" in stages
+                scans += collscan
+                embed.add_field(
+                    name=f"{'⚠️ ' if collscan else ''}{document.document_name}",
+                    value=(
+                        f"```{str(filter_dict)[:300]}```"
+                        f"sort: `{sort}`\n"
+                        f"plan: `{' > '.join(stages)}`"
+                    )[:1024],
+                    inline=False,
+                )
+
+        embed.description = (
+            f"**{scans}** of {len(embed.fields)} queries scan the whole collection"
+            if embed.fields
+            else "No queries have been issued yet"
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
 
 async def setup(bot):
     await bot.add_cog(Dev(bot))
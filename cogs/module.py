@@ -1,12 +1,62 @@
+import asyncio
 import discord
 import datetime
+import logging
+import time
+from typing import Tuple
 from discord.ext import commands, tasks
 from discord import app_commands, Interaction
-from utils.transformer import TimeConverter
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+from utils.transformer import ReminderIdConverter, TimeConverter
 from humanfriendly import format_timespan
-from utils.converters import chunk
 from utils.db import Document
-from utils.paginator import Paginator
+from utils.delivery import DeliveryPool, DMChannelCache
+from utils.events import ChangeStreamListener, DeleteEvent, InsertEvent
+from utils.ids import SnowflakeGenerator
+from utils import models
+from utils.metrics import Metrics
+from utils.packing import pack_reminders
+from utils.pages import ReminderPages
+from utils.paginator import Paginator, register_source, unregister_source
+from utils.scheduler import ReminderScheduler
+from utils.user_index import UserReminderIndex, search_reminders
+
+log = logging.getLogger(__name__)
+
+DUE_BATCH_SIZE = 500
+SCHEDULE_BATCH_SIZE = 10_000
+LIST_PAGE_SIZE = 5
+# What persistent /reminder list paginators are registered under
+LIST_SOURCE = "reminders"
+LIST_PROJECTION = {"time": 1, "message": 1}
+# Jump url updates made by /reminder set within this
+# long of each other are sent as one bulk write
+WRITE_BUFFER_DELAY = 0.5
+WRITE_BUFFER_SIZE = 1000
+DUE_PROJECTION = {"time": 1, "user": 1, "message": 1, "url": 1, "attempts": 1}
+DELIVERY_CONCURRENCY = 16
+DELIVERY_LEASE = 60
+MAX_DELIVERY_ATTEMPTS = 5
+DM_PREFETCH_WINDOW = 300
+# Reminders overdue by more than this are left to the backlog lane
+CATCH_UP_AFTER = 30
+BACKLOG_BATCH_SIZE = 100
+BACKLOG_CONCURRENCY = 4
+BACKLOG_BATCH_INTERVAL = 1
+BATCH_SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+USER_INDEX_SIZE = 10_000
+# Without change streams other processes' writes go unseen
+USER_INDEX_TTL = 300
+USER_INDEX_PROJECTION = {"time": 1, "message": 1}
+REMINDER_INDEXES = [
+    # Due reminders, the backlog and the schedule
+    IndexModel([("time", 1)]),
+    # A user's reminders in the order they are listed
+    IndexModel([("user", 1), ("time", 1)]),
+    # Reading back a claim
+    IndexModel([("lease_token", 1)], sparse=True),
+]
 
 
 @app_commands.user_install()
@@ -15,64 +65,270 @@ from utils.paginator import Paginator
 class Reminder(commands.GroupCog, name="reminder"):
     def __init__(self, bot):
         self.bot = bot
-        self.reminders = Document(bot.db, "reminders")
+        self.reminders = Document(
+            bot.db,
+            "reminders",
+            converter=models.Reminder,
+            indexes=REMINDER_INDEXES,
+            slow_query=bot.slow_query,
+        )
+        self.reminders.buffer_writes(
+            max_delay=WRITE_BUFFER_DELAY, max_writes=WRITE_BUFFER_SIZE
+        )
         self.bot.reminders = self.reminders
+        self.ids = SnowflakeGenerator(bot.worker_id)
+        self.user_reminders = UserReminderIndex(
+            maxsize=USER_INDEX_SIZE,
+            ttl=None if bot.change_streams else USER_INDEX_TTL,
+        )
+        # Without change streams other processes may add reminders
+        # we never see, so never sleep longer than a lease.
+        self.scheduler = ReminderScheduler(max_sleep=DELIVERY_LEASE)
+        self.due_backlog = False
+        self.metrics = Metrics(
+            buckets={
+                "due_batch_size": BATCH_SIZE_BUCKETS,
+                "backlog_batch_size": BATCH_SIZE_BUCKETS,
+            }
+        )
+        self.delivery = DeliveryPool(concurrency=DELIVERY_CONCURRENCY)
+        self.dm_channels = DMChannelCache(bot, self.delivery)
+        self.change_stream = ChangeStreamListener(self.reminders)
+        self.reminders.subscribe(self.on_reminder_write)
+        self.reminders.subscribe(self.user_reminders.apply)
         self.check_reminders.start()
+        self.drain_backlog.start()
+        self.prefetch_dm_channels.start()
+
+    async def cog_load(self):
+        register_source(LIST_SOURCE, self.reminder_pages)
+        await self.reminders.ensure_indexes()
+        if self.bot.change_streams:
+            self.change_stream.start()
 
-    def cog_unload(self):
-        self.check_reminders.stop()
+    async def cog_unload(self):
+        loops = (self.check_reminders, self.drain_backlog, self.prefetch_dm_channels)
+        for loop in loops:
+            loop.cancel()
+        # Let the cancelled iterations unwind before the buffer closes
+        await asyncio.gather(
+            *(loop.get_task() for loop in loops if loop.get_task() is not None),
+            return_exceptions=True,
+        )
+        self.change_stream.stop()
+        unregister_source(LIST_SOURCE)
+        await self.reminders.write_buffer.close()
+
+    def on_reminder_write(self, event):
+        if isinstance(event, DeleteEvent):
+            if event.ids is not None:
+                self.scheduler.remove_many(event.ids)
+        elif isinstance(event, InsertEvent):
+            for reminder in event.documents:
+                if "time" in reminder:
+                    self.scheduler.add(
+                        models.Reminder(
+                            reminder["_id"], reminder["time"], reminder.get("user")
+                        )
+                    )
+        elif "time" in event.fields and event.ids is not None:
+            for reminder_id in event.ids:
+                self.scheduler.reschedule(reminder_id, event.fields["time"])
 
-    async def generate_id(self, user: discord.User | discord.Member):
-        return int(
-            str(user.id)[:8]
-            + str(discord.utils.utcnow().timestamp()).replace(".", "")[-4:]
+    async def reminder_pages(self, user_id: int, index: int, state: str):
+        return ReminderPages.from_state(
+            self.reminders,
+            user_id,
+            index,
+            state,
+            color=self.bot.default_color,
+            per_page=LIST_PAGE_SIZE,
+            projection=LIST_PROJECTION,
         )
 
-    @tasks.loop(seconds=10)
+    async def flush_writes(self):
+        """
+        Send the queued writes so the index sees them. Rejected
+        writes belong to someone else's command, so are only logged.
+        """
+        try:
+            await self.reminders.flush()
+        except BulkWriteError:
+            log.exception("Buffered reminder writes failed")
+
+    async def search_user_reminders(self, user_id: int, text: str):
+        await self.flush_writes()
+        found = self.user_reminders.search(user_id, text)
+        if found is not None:
+            return found
+
+        generation = self.user_reminders.generation
+        reminders = [
+            reminder
+            async for reminder in self.reminders.iter_many(
+                {"user": user_id}, projection=USER_INDEX_PROJECTION
+            )
+        ]
+        if not self.user_reminders.load(user_id, reminders, generation):
+            # Writes landed while reading that can't be replayed,
+            # answer from what was read and load again next time
+            return search_reminders(reminders, text)
+        return self.user_reminders.search(user_id, text)
+
+    async def claim_due(self, filter_dict, limit: int):
+        return await self.reminders.claim(
+            filter_dict,
+            self.bot.lease_owner,
+            DELIVERY_LEASE,
+            limit,
+            sort=[("time", 1)],
+            projection=DUE_PROJECTION,
+        )
+
+    @tasks.loop()
     async def check_reminders(self):
-        reminders = await self.reminders.get_all()
+        if not self.due_backlog:
+            await self.scheduler.wait()
+        started = time.perf_counter()
+        now = datetime.datetime.utcnow()
+        # The schedule only decides when to wake up. Delivery claims
+        # by time range, which also picks up reminders other processes
+        # wrote, so the due entries are just dropped here to let
+        # wait() sleep until the next one.
+        self.scheduler.pop_due(now)
+        catch_up = now - datetime.timedelta(seconds=CATCH_UP_AFTER)
+        reminders = await self.claim_due(
+            {"time": {"$gt": catch_up, "$lte": now}}, DUE_BATCH_SIZE
+        )
+        self.due_backlog = len(reminders) >= DUE_BATCH_SIZE
+        self.metrics.observe("due_batch_size", len(reminders))
+        await self.deliver_due(reminders)
+        self.metrics.observe("tick_seconds", time.perf_counter() - started)
+
+    @tasks.loop(seconds=DELIVERY_LEASE)
+    async def drain_backlog(self):
+        # Overdue reminders (after downtime, or whose delivery failed and
+        # whose lease expired) are streamed in small batches with less
+        # concurrency, so freshly due reminders keep their precision.
+        catch_up = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=CATCH_UP_AFTER
+        )
+        cursor = self.reminders.iter_many(
+            {"time": {"$lte": catch_up}},
+            sort=[("time", 1)],
+            batch_size=BACKLOG_BATCH_SIZE,
+            projection={"_id": 1},
+        )
+        batch, drained = [], 0
+        async for reminder in cursor:
+            batch.append(reminder.id)
+            if len(batch) >= BACKLOG_BATCH_SIZE:
+                drained += await self.drain_batch(batch)
+                batch = []
+                await asyncio.sleep(BACKLOG_BATCH_INTERVAL)
+        if batch:
+            drained += await self.drain_batch(batch)
+
+        if drained:
+            log.info("Drained %s overdue reminders", drained)
+
+    async def drain_batch(self, reminder_ids) -> int:
+        reminders = await self.claim_due(
+            {"_id": {"$in": reminder_ids}}, len(reminder_ids)
+        )
+        self.metrics.observe("backlog_batch_size", len(reminders))
+        await self.deliver_due(reminders, concurrency=BACKLOG_CONCURRENCY)
+        return len(reminders)
+
+    async def deliver_due(self, reminders, concurrency=None):
         reminders_dms = {}
         for reminder in reminders:
-            if reminder["time"] < datetime.datetime.utcnow():
-                if reminder["user"] not in reminders_dms.keys():
-                    reminders_dms[reminder["user"]] = []
-
-                reminders_dms[reminder["user"]].append(reminder)
-
-        for dms, reminder in reminders_dms.items():
-            user = self.bot.get_user(dms)
-            view = discord.ui.View()
-            if not isinstance(user, discord.User):
-                user = await self.bot.fetch_user(dms)
-
-            embed = discord.Embed(title="Reminders", color=self.bot.default_color)
-            for rem in reminder:
-                embed.add_field(
-                    name=f"Reminder ID: {rem['_id']}",
-                    value=f"Message: {rem['message']}",
-                    inline=False,
-                )
-                if len(view.children) < 20:
-                    emoji = self.bot.link_emoji if self.bot.link_emoji else "🔗"
-                    view.add_item(
-                        discord.ui.Button(
-                            style=discord.ButtonStyle.url,
-                            label=f"Rem. ID: {rem['_id']}",
-                            url=rem["url"],
-                            emoji=emoji,
-                        )
-                    )
-            try:
-                await user.send(embed=embed, view=view)
-            except discord.Forbidden:
-                pass
+            if reminder.user not in reminders_dms.keys():
+                reminders_dms[reminder.user] = []
+
+            reminders_dms[reminder.user].append(reminder)
 
-            for rem in reminder:
-                await self.reminders.delete(rem)
+        emoji = self.bot.link_emoji if self.bot.link_emoji else "🔗"
+        messages = [
+            (dms, message)
+            for dms, reminder in reminders_dms.items()
+            for message in pack_reminders(reminder, self.bot.default_color, emoji)
+        ]
+        results = await self.delivery.run(
+            messages, self.deliver_reminders, concurrency=concurrency
+        )
+        acknowledged = []
+        for result in results:
+            _, message = result.job
+            if result.delivered:
+                self.metrics.increment("delivered", len(message.reminders))
+                acknowledged.extend(r.id for r in message.reminders)
+                continue
+            if isinstance(result.error, (discord.Forbidden, discord.NotFound)):
+                self.metrics.increment("forbidden", len(message.reminders))
+                acknowledged.extend(r.id for r in message.reminders)
+                continue
+
+            # Failed reminders keep their lease and are picked
+            # up by the backlog lane once it expires.
+            log.warning("Failed to deliver reminders: %r", result.error)
+            self.metrics.increment("failed", len(message.reminders))
+            for reminder in message.reminders:
+                if reminder.attempts >= MAX_DELIVERY_ATTEMPTS:
+                    self.metrics.increment("dropped")
+                    acknowledged.append(reminder.id)
+
+        if acknowledged:
+            await self.reminders.delete_many(acknowledged)
+
+    async def deliver_reminders(self, job):
+        user_id, message = job
+        for attempt in range(2):
+            channel = await self.dm_channels.get_channel(user_id)
+            await self.delivery.acquire(channel.id)
+            try:
+                await channel.send(embeds=message.embeds, view=message.view)
+            except discord.NotFound:
+                # The cached channel may be stale, reopen it once
+                self.dm_channels.invalidate(user_id)
+                if attempt:
+                    raise
+            else:
+                sent_at = datetime.datetime.utcnow()
+                for reminder in message.reminders:
+                    self.metrics.observe(
+                        "delivery_lag_seconds",
+                        (sent_at - reminder.time).total_seconds(),
+                    )
+                return
 
     @check_reminders.before_loop
     async def before_check_reminders(self):
         await self.bot.wait_until_ready()
+        await self.scheduler.load(
+            self.reminders.iter_all(
+                projection={"time": 1, "user": 1}, batch_size=SCHEDULE_BATCH_SIZE
+            )
+        )
+
+    @drain_backlog.before_loop
+    async def before_drain_backlog(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=1)
+    async def prefetch_dm_channels(self):
+        until = datetime.datetime.utcnow() + datetime.timedelta(
+            seconds=DM_PREFETCH_WINDOW
+        )
+        await self.dm_channels.prefetch(
+            reminder.user
+            for reminder in self.scheduler.upcoming(until)
+            if reminder.user is not None
+        )
+
+    @prefetch_dm_channels.before_loop
+    async def before_prefetch_dm_channels(self):
+        await self.bot.wait_until_ready()
 
     @app_commands.command(name="set", description="Set a reminder")
     @app_commands.describe(
@@ -86,84 +342,106 @@ class Reminder(commands.GroupCog, name="reminder"):
         message: str,
     ):
         try:
-            reminder_id = await self.generate_id(interaction.user)
-            data = {
-                "_id": reminder_id,
-                "time": datetime.datetime.utcnow() + datetime.timedelta(seconds=time),
-                "message": message,
-                "user": interaction.user.id,
-                "url": None,
-            }
-            await self.reminders.insert(data=data)
+            reminder_id = self.ids.next()
+            reminder = models.Reminder(
+                reminder_id,
+                time=datetime.datetime.utcnow() + datetime.timedelta(seconds=time),
+                user=interaction.user.id,
+                message=message,
+            )
+            # Sent straight away so a failure is reported here
+            await self.reminders.insert(data=reminder.to_document(), buffered=False)
         except Exception as e:
             return await interaction.response.send_message(
                 f"An error occured: {e}", ephemeral=True
             )
 
         await interaction.response.send_message(
-            f"Okay I have added a reminder with ID `{reminder_id}` which will trigger in {format_timespan(time)}",
+            f"Okay I have added a reminder with ID `{reminder.code}` which will trigger in {format_timespan(time)}",
             ephemeral=False,
         )
         msg = await interaction.original_response()
-        data["url"] = msg.jump_url
-        await self.reminders.update(data)
+        await self.reminders.update_field_to(reminder_id, "url", msg.jump_url)
 
     @app_commands.command(name="list", description="List all reminders")
     async def list_reminders(self, interaction: Interaction):
-        reminders = await self.reminders.find_many_by_custom(
-            {"user": interaction.user.id}
-        )
-        if not reminders:
+        count = await self.reminders.count({"user": interaction.user.id})
+        if not count:
             return await interaction.response.send_message(
                 "You have no reminders set", ephemeral=True
             )
 
-        reminders = sorted(reminders, key=lambda x: x["time"])
-        chunked = chunk(reminders, 5)
-        i = 1
-        pages = []
-        for chunks in chunked:
-            embed = discord.Embed(
-                title="Reminders", color=self.bot.default_color, description=""
-            )
-            for reminder in chunks:
-                time = reminder["time"]
-                timestamp = int(time.timestamp())
-                embed.description += f"{i}: {reminder['message']}\n> <t:{timestamp}:R> (<t:{timestamp}:f>) \n"
-                i += 1
-                pages.append(embed)
-
+        pages = ReminderPages(
+            self.reminders,
+            interaction.user.id,
+            count,
+            self.bot.default_color,
+            per_page=LIST_PAGE_SIZE,
+            projection=LIST_PROJECTION,
+        )
         await Paginator(interaction=interaction, pages=pages).start(
-            embeded=True, timeout=30, quick_navigation=False, hidden=True
+            embeded=True, quick_navigation=True, hidden=True, persistent=LIST_SOURCE
         )
 
     @app_commands.command(name="delete", description="Delete a reminder")
     @app_commands.describe(reminder_id="The reminder to delete")
-    async def delete_reminder(self, interaction: Interaction, reminder_id: int):
-        reminder = await self.reminders.find_one_by_custom(
-            {"id": reminder_id, "user": interaction.user.id}
-        )
-        if not reminder:
+    async def delete_reminder(
+        self,
+        interaction: Interaction,
+        reminder_id: app_commands.Transform[Tuple[int, ...], ReminderIdConverter],
+    ):
+        user_id = interaction.user.id
+        result = None
+        await self.flush_writes()
+        for candidate in reminder_id:
+            # Someone else's reminder needs no round trip
+            if self.user_reminders.owns(user_id, candidate) is False:
+                continue
+            result = await self.reminders.delete_by_custom(
+                {"_id": candidate, "user": user_id}
+            )
+            if result is not None:
+                break
+        if result is None:
             return await interaction.response.send_message(
                 "Reminder not found", ephemeral=True
             )
 
-        await self.reminders.delete(reminder)
         await interaction.response.send_message(
             "Reminder has been deleted", ephemeral=True
         )
 
+    @delete_reminder.autocomplete("reminder_id")
+    async def delete_reminder_autocomplete(
+        self, interaction: Interaction, current: str
+    ):
+        reminders = await self.search_user_reminders(interaction.user.id, current)
+        return [
+            app_commands.Choice(
+                name=(
+                    f"{reminder.code} · {reminder.time:%d %b %H:%M} UTC · "
+                    f"{reminder.message}"
+                )[:100],
+                value=reminder.code,
+            )
+            for reminder in reminders
+        ]
+
     @app_commands.command(name="clear", description="Clear all reminders")
     async def clear_reminders(self, interaction: Interaction):
-        reminders = await self.reminders.find_many_by_custom(
-            {"user": interaction.user.id}
-        )
-        if not reminders:
+        # Always read fresh, a stale list would leave reminders behind
+        ids = [
+            reminder.id
+            async for reminder in self.reminders.iter_many(
+                {"user": interaction.user.id}, projection={"_id": 1}
+            )
+        ]
+        if not ids:
             return await interaction.response.send_message(
                 "You have no reminders set", ephemeral=True
             )
 
-        await self.reminders.delete_many(reminders)
+        await self.reminders.delete_many(ids)
         await interaction.response.send_message(
             "All reminders have been deleted", ephemeral=True
         )
@@ -1,5 +1,6 @@
 import logging
 import os
+import socket
 import asyncio
 import logging.handlers
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -10,6 +11,11 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 
+from utils.db import SLOW_QUERY_SECONDS
+from utils.ids import MAX_WORKER
+from utils.paginator import PageButton, PageSelect
+from utils.sqlite import SQLiteDatabase
+
 load_dotenv()
 
 discord.utils.setup_logging(
@@ -38,16 +44,46 @@ class Botbase(commands.Bot):
             application_id=application_id,
         )
         self.default_color = 0x2B2D31
-        self.connection_url = os.environ.get("MONGO")
-        self.mongo = AsyncIOMotorClient(self.connection_url)
-        self.db = self.mongo["Database"]
+        self.storage = os.environ.get("STORAGE", "mongo").lower()
+        if self.storage == "sqlite":
+            self.db = SQLiteDatabase(os.environ.get("SQLITE_PATH") or "bot.db")
+            self.change_streams = False
+        else:
+            self.connection_url = os.environ.get("MONGO")
+            self.mongo = AsyncIOMotorClient(self.connection_url)
+            self.db = self.mongo["Database"]
+            self.change_streams = os.environ.get(
+                "MONGO_CHANGE_STREAMS", ""
+            ).lower() in ("1", "true", "yes")
+        slow_query = os.environ.get("SLOW_QUERY_MS")
+        self.slow_query = (
+            float(slow_query) / 1000 if slow_query else SLOW_QUERY_SECONDS
+        )
         self.link_emoji = os.environ.get("LINK_EMOJI")
+        # Reminder ids embed it, so it must be unique per running process
+        worker_id = os.environ.get("WORKER_ID", "").strip()
+        if not worker_id.isdecimal() or int(worker_id) > MAX_WORKER:
+            raise RuntimeError(
+                f"WORKER_ID must be set to a number from 0 to {MAX_WORKER}, "
+                "different for every process"
+            )
+        self.worker_id = int(worker_id)
+        # Names the process in delivery leases
+        self.lease_owner = f"{socket.gethostname()}:{os.getpid()}"
 
     async def setup_hook(self):
+        # Persistent paginators are handled here whichever cog sent them
+        self.add_dynamic_items(PageButton, PageSelect)
         for file in os.listdir("cogs"):
             if file.endswith(".py") and not file.startswith("_"):
                 await self.load_extension(f"cogs.{file[:-3]}")
 
+    async def close(self):
+        # Cogs flush their pending writes while closing
+        await super().close()
+        if self.storage == "sqlite":
+            self.db.close()
+
 
 bot = Botbase(os.environ.get("APP_ID"))
 
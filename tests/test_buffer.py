@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from utils.buffer import _merge_updates, _PendingWrite
+from utils.db import Document
+from utils.sqlite import SQLiteDatabase
+
+
+@pytest.fixture
+def db():
+    with tempfile.TemporaryDirectory() as directory:
+        database = SQLiteDatabase(os.path.join(directory, "test.db"))
+        yield database
+        database.close()
+
+
+def test_unbuffered_insert_raises_its_own_rejection(db):
+    async def run():
+        items = Document(db, "items")
+        items.buffer_writes(max_delay=60)
+        await items.insert({"_id": 1}, buffered=False)
+        await items.insert({"_id": 2})
+        with pytest.raises(DuplicateKeyError):
+            await items.insert({"_id": 1}, buffered=False)
+        # Queued writes to other _id's wait for the buffer
+        queued = len(items.write_buffer)
+        await items.insert({"_id": 3}, buffered=False)
+        await items.write_buffer.close()
+        return queued, sorted(d["_id"] for d in await items.get_all())
+
+    assert asyncio.run(run()) == (1, [1, 2, 3])
+
+
+def test_unbuffered_insert_sends_queued_writes_to_its_id_first(db):
+    async def run():
+        items = Document(db, "items")
+        items.buffer_writes(max_delay=60)
+        await items.insert({"_id": 1})
+        with pytest.raises(DuplicateKeyError):
+            await items.insert({"_id": 1}, buffered=False)
+        await items.write_buffer.close()
+        return await items.get_all()
+
+    assert asyncio.run(run()) == [{"_id": 1}]
+
+
+def test_delete_reports_whether_anything_matched(db):
+    async def run():
+        items = Document(db, "items")
+        items.buffer_writes(max_delay=60)
+        await items.insert({"_id": 1})
+        deleted = await items.delete(1)
+        missing = await items.delete(1)
+        await items.write_buffer.close()
+        return deleted.deleted_count, missing
+
+    assert asyncio.run(run()) == (1, None)
+
+
+def test_insert_merges_foldable_updates():
+    insert = _PendingWrite("insert", document={"_id": 1, "a": 1, "b": 2, "n": 1})
+    update = _PendingWrite(
+        "update", update={"$set": {"a": 5}, "$unset": {"b": ""}, "$inc": {"n": 2}}
+    )
+    merged = insert.merge(update)
+    assert merged.kind == "insert"
+    assert merged.document == {"_id": 1, "a": 5, "n": 3}
+    # The queued insert itself is left alone
+    assert insert.document == {"_id": 1, "a": 1, "b": 2, "n": 1}
+
+
+def test_insert_keeps_updates_it_cannot_fold():
+    insert = _PendingWrite("insert", document={"_id": 1})
+    for update in ({"$push": {"tags": "x"}}, {"$set": {"a.b": 1}}):
+        assert insert.merge(_PendingWrite("update", update=update)) is insert
+
+
+def test_updates_merge_unless_they_conflict():
+    first = _PendingWrite("update", update={"$set": {"a": 1}, "$inc": {"n": 1}})
+    second = _PendingWrite("update", update={"$set": {"a": 2}, "$inc": {"n": 2}})
+    merged = first.merge(second)
+    assert merged.update == {"$set": {"a": 2}, "$inc": {"n": 3}}
+    assert not merged.upsert
+    upsert = _PendingWrite("update", update={"$set": {"b": 1}}, upsert=True)
+    assert first.merge(upsert).upsert
+
+
+def test_merge_updates():
+    assert _merge_updates({"$set": {"a": 1}}, {"$unset": {"b": ""}}) == {
+        "$set": {"a": 1},
+        "$unset": {"b": ""},
+    }
+    # One field changed by two operators can't be merged
+    assert _merge_updates({"$set": {"a": 1}}, {"$inc": {"a": 1}}) is None
+    assert _merge_updates({"$push": {"a": 1}}, {"$push": {"a": 2}}) is None
+    assert _merge_updates({"$push": {"a": 1}}, {"$push": {"b": 2}}) == {
+        "$push": {"a": 1, "b": 2}
+    }
@@ -0,0 +1,127 @@
+import asyncio
+import datetime
+import os
+import tempfile
+
+import pytest
+
+import cogs.module as module
+from benchmarks.memory_db import MemoryDatabase
+from benchmarks.scheduler import BenchBot, BenchChannel
+from utils.db import Document
+from utils.events import UpdateEvent
+from utils.sqlite import SQLiteDatabase
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db():
+    with tempfile.TemporaryDirectory() as directory:
+        database = SQLiteDatabase(os.path.join(directory, "test.db"))
+        yield database
+        database.close()
+
+
+async def load(items, size=10, **fields):
+    await items.bulk_insert([{"_id": i, "time": NOW, **fields} for i in range(size)])
+
+
+def test_concurrent_claimers_never_share_an_item(db):
+    async def run():
+        first, second = Document(db, "items"), Document(db, "items")
+        await load(first)
+        claims = await asyncio.gather(
+            first.claim({}, "first", 60, 10), second.claim({}, "second", 60, 10)
+        )
+        again = await first.claim({}, "first", 60, 10)
+        return [{item["_id"] for item in claim} for claim in claims], again
+
+    (a, b), again = asyncio.run(run())
+    assert not a & b
+    assert a | b == set(range(10))
+    assert again == []
+
+
+def test_expired_leases_can_be_claimed_again(db):
+    async def run():
+        items = Document(db, "items")
+        await load(items, 3)
+        events = []
+        items.subscribe(events.append, UpdateEvent)
+
+        # A lease that has already run out, as if its holder died
+        expired = await items.claim({}, "dead", -1, 2, sort=[("_id", 1)])
+        claimed = await items.claim(
+            {}, "alive", 60, 10, sort=[("_id", 1)], projection={"time": 1}
+        )
+        return expired, claimed, events
+
+    expired, claimed, events = asyncio.run(run())
+    assert [item["_id"] for item in expired] == [0, 1]
+    assert [item["_id"] for item in claimed] == [0, 1, 2]
+    # The projection is respected though attempts is read back
+    assert all(set(item) == {"_id", "time"} for item in claimed)
+    attempts = {
+        _id: event.fields["attempts"] for event in events[1:] for _id in event.ids
+    }
+    assert attempts == {0: 2, 1: 2, 2: 1}
+
+
+class FailingChannel(BenchChannel):
+    async def send(self, **kwargs) -> None:
+        raise RuntimeError("Discord is down")
+
+
+class FailingBot(BenchBot):
+    def get_partial_messageable(self, channel_id: int, *, type=None):
+        return FailingChannel(self, channel_id)
+
+
+def test_reminders_are_dropped_after_too_many_attempts():
+    async def run():
+        db = MemoryDatabase()
+        cog = module.Reminder(FailingBot(db))
+        for loop in (cog.check_reminders, cog.drain_backlog, cog.prefetch_dm_channels):
+            loop.cancel()
+        await cog.cog_load()
+        now = datetime.datetime.utcnow()
+        await db["reminders"].insert_many(
+            [
+                {"_id": 1, "time": now, "user": 1, "message": "a", "attempts": 0},
+                {
+                    "_id": 2,
+                    "time": now,
+                    "user": 2,
+                    "message": "b",
+                    "attempts": module.MAX_DELIVERY_ATTEMPTS - 1,
+                },
+            ]
+        )
+        reminders = await cog.claim_due({}, 10)
+        await cog.deliver_due(reminders)
+        left = await db["reminders"].find({}).to_list(None)
+        await cog.cog_unload()
+        return cog.metrics.counters, left
+
+    counters, left = asyncio.run(run())
+    assert counters["dropped"] == 1
+    assert [(item["_id"], item["attempts"]) for item in left] == [(1, 1)]
+
+
+def test_someone_elses_rejected_write_does_not_fail_autocomplete(db):
+    async def run():
+        cog = module.Reminder(BenchBot(db))
+        for loop in (cog.check_reminders, cog.drain_backlog, cog.prefetch_dm_channels):
+            loop.cancel()
+        await cog.cog_load()
+        await db["reminders"].insert_one(
+            {"_id": 1, "time": NOW, "user": 1, "message": "water the plants"}
+        )
+        # Queues an insert the server will reject as a duplicate
+        await cog.reminders.insert({"_id": 1, "time": NOW, "user": 2})
+        found = await cog.search_user_reminders(1, "water")
+        await cog.cog_unload()
+        return [reminder.id for reminder in found]
+
+    assert asyncio.run(run()) == [1]
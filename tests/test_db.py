@@ -0,0 +1,45 @@
+import asyncio
+
+from benchmarks.memory_db import MemoryDatabase
+from utils.db import Document
+
+
+def test_stopping_iter_many_early_is_not_an_error():
+    async def run():
+        items = Document(MemoryDatabase(), "items")
+        await items.bulk_insert([{"_id": i} for i in range(10)])
+
+        async for _ in items.iter_many({}):
+            break
+        # Let the event loop finalise the generator left behind
+        await asyncio.sleep(0)
+        iterator = items.iter_many({})
+        await iterator.__anext__()
+        await iterator.aclose()
+        return items
+
+    stats = asyncio.run(run()).stats["iter_many"]
+    assert stats.calls == 2
+    assert stats.errors == 0
+
+
+def test_delete_many_reports_only_what_is_gone():
+    async def run():
+        database = MemoryDatabase()
+        items = Document(database, "items")
+        await items.bulk_insert([{"_id": i} for i in range(3)])
+        deleted = []
+        items.subscribe(lambda event: deleted.extend(event.ids))
+
+        collection = database["items"]
+        delete_many = collection.delete_many
+
+        async def delete_only_the_first(filter_dict, **kwargs):
+            # Stands in for items a concurrent write keeps around
+            return await delete_many({"_id": filter_dict["_id"]["$in"][0]})
+
+        collection.delete_many = delete_only_the_first
+        count = await items.delete_many([0, 1, 2])
+        return count, deleted
+
+    assert asyncio.run(run()) == (1, [0])
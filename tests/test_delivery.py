@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from utils.delivery import DeliveryPool
+
+
+def test_prune_keeps_buckets_with_waiting_acquirers():
+    async def run():
+        pool = DeliveryPool(route_rate=2, route_per=0.2)
+        sent = []
+
+        async def send():
+            await pool.acquire("route")
+            sent.append(time.monotonic())
+
+        await send()
+        await send()
+        # One acquirer sleeps on the empty bucket, another queues behind it
+        waiting = [asyncio.ensure_future(send()) for _ in range(2)]
+        await asyncio.sleep(0)
+        # A stalled loop lets the bucket refill before they wake,
+        # and another run finishing prunes meanwhile
+        time.sleep(0.3)
+        pool._prune_routes()
+        await asyncio.gather(send(), send(), *waiting)
+        return sent[2:]
+
+    sent = sorted(asyncio.run(run()))
+    # A fresh bucket beside the old one would let all four go at once
+    assert sent[-1] - sent[0] >= 0.2 * 0.9
+
+
+def test_prune_drops_idle_buckets():
+    async def run():
+        pool = DeliveryPool(route_rate=2, route_per=0.01)
+
+        async def send(job):
+            await pool.acquire(job)
+
+        await pool.run(range(3), send)
+        await asyncio.sleep(0.02)
+        await pool.run([], send)
+        return pool._routes
+
+    assert asyncio.run(run()) == {}
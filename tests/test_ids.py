@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+
+import bson
+import pytest
+
+import utils.ids
+from utils.ids import (
+    MAX_ID,
+    MAX_SEQUENCE,
+    MAX_WORKER,
+    SEQUENCE_BITS,
+    SnowflakeGenerator,
+    created_at,
+    decode_id,
+    encode_id,
+)
+from utils.transformer import ReminderIdConverter
+
+
+def test_decode_id_rejects_ids_bson_cannot_store():
+    assert decode_id("Z" * 14) is None
+    assert decode_id("Z" * 13) is None
+    assert decode_id(encode_id(MAX_ID)) == MAX_ID
+    bson.encode({"_id": decode_id(encode_id(MAX_ID))})
+
+
+def test_all_digit_codes_also_try_the_old_numeric_ids():
+    converter = ReminderIdConverter()
+    assert asyncio.run(converter.transform(None, "123456789012")) == (
+        decode_id("123456789012"),
+        123456789012,
+    )
+    assert asyncio.run(converter.transform(None, "a8n4")) == (decode_id("A8N4"),)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(1735689600.0)  # 2025-01-01
+    monkeypatch.setattr(utils.ids, "time", clock)
+    return clock
+
+
+def test_snowflakes_grow_even_when_the_clock_steps_back(clock):
+    generator = SnowflakeGenerator(5)
+    ids = []
+    for step in (0, 0.001, 0.001, -2, 0.002, 5):
+        clock.now += step
+        ids.append(generator.next())
+    assert ids == sorted(set(ids))
+    assert all(snowflake >> SEQUENCE_BITS & MAX_WORKER == 5 for snowflake in ids)
+
+
+def test_sequence_overflow_borrows_the_next_millisecond(clock):
+    generator = SnowflakeGenerator(0)
+    ids = [generator.next() for _ in range(MAX_SEQUENCE + 2)]
+    assert ids == sorted(set(ids))
+    assert created_at(ids[MAX_SEQUENCE]) == created_at(ids[0])
+    assert created_at(ids[-1]) - created_at(ids[0]) == datetime.timedelta(
+        milliseconds=1
+    )
+    # Once the clock catches up the borrowed millisecond isn't reused
+    clock.now += 0.001
+    assert generator.next() > ids[-1]
+
+
+def test_workers_never_share_ids(clock):
+    first, second = SnowflakeGenerator(1), SnowflakeGenerator(2)
+    ids = [generator.next() for _ in range(100) for generator in (first, second)]
+    assert len(set(ids)) == len(ids)
+
+
+@pytest.mark.parametrize("worker", [-1, MAX_WORKER + 1, True, "1"])
+def test_worker_numbers_are_checked(worker):
+    with pytest.raises(ValueError):
+        SnowflakeGenerator(worker)
+
+
+@pytest.mark.parametrize("snowflake", [0, 1, 31, 32, 123456789012345, MAX_ID])
+def test_codes_round_trip(snowflake):
+    code = encode_id(snowflake)
+    assert decode_id(code) == snowflake
+    assert decode_id(f" {code.lower()} ") == snowflake
+
+
+def test_look_alikes_and_dashes_are_forgiven():
+    assert decode_id("1O-l1") == decode_id("1011")
+    assert decode_id("U1") is None
+    assert decode_id("") is None
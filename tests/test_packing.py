@@ -0,0 +1,76 @@
+import asyncio
+
+from utils.models import Reminder
+from utils.packing import (
+    MAX_BUTTONS,
+    MAX_EMBED_CHARACTERS,
+    MAX_EMBEDS,
+    MAX_FIELD_VALUE,
+    MAX_FIELDS,
+    pack_reminders,
+)
+
+
+def pack(reminders):
+    async def run():
+        return pack_reminders(reminders, 0)
+
+    return asyncio.run(run())
+
+
+def characters(message):
+    return sum(
+        len(embed.title or "")
+        + sum(len(field.name) + len(field.value) for field in embed.fields)
+        for embed in message.embeds
+    )
+
+
+def check_limits(messages):
+    for message in messages:
+        assert 1 <= len(message.embeds) <= MAX_EMBEDS
+        assert all(len(embed.fields) <= MAX_FIELDS for embed in message.embeds)
+        assert characters(message) <= MAX_EMBED_CHARACTERS
+        assert len(message.view.children) <= MAX_BUTTONS
+
+
+def test_fields_fill_embeds_then_messages():
+    (message,) = pack([Reminder(i, message="x") for i in range(MAX_FIELDS + 1)])
+    assert [len(embed.fields) for embed in message.embeds] == [MAX_FIELDS, 1]
+    # Even the shortest fields hit the character total before the embed count
+    messages = pack([Reminder(i, message="x") for i in range(MAX_FIELDS * MAX_EMBEDS)])
+    check_limits(messages)
+    assert len(messages) == 2
+
+
+def test_characters_start_a_new_message():
+    reminders = [Reminder(i, message="x" * 1000) for i in range(12)]
+    messages = pack(reminders)
+    check_limits(messages)
+    # Each field is 1023 characters, so six would pass 6000
+    assert [len(message.reminders) for message in messages] == [5, 5, 2]
+
+
+def test_long_messages_are_cut_to_the_field_limit():
+    (message,) = pack([Reminder(1, message="x" * 5000)])
+    (field,) = message.embeds[0].fields
+    assert len(field.value) == MAX_FIELD_VALUE
+    assert field.value.endswith("…")
+
+
+def test_buttons_start_a_new_message():
+    reminders = [
+        Reminder(i, message="x", url=f"https://discord.com/channels/1/2/{i}")
+        for i in range(MAX_BUTTONS + 1)
+    ]
+    messages = pack(reminders)
+    check_limits(messages)
+    assert [len(message.view.children) for message in messages] == [MAX_BUTTONS, 1]
+
+
+def test_every_reminder_is_shown_once_in_order():
+    reminders = [Reminder(i, message="x" * (i * 37 % 1100)) for i in range(400)]
+    messages = pack(reminders)
+    check_limits(messages)
+    shown = [reminder for message in messages for reminder in message.reminders]
+    assert shown == reminders
@@ -0,0 +1,127 @@
+import asyncio
+import datetime
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.memory_db import MemoryDatabase
+from utils.db import Document
+from utils.models import Reminder
+from utils.pages import LIST_SORT, ReminderPages
+from utils.sqlite import SQLiteDatabase
+
+NOW = datetime.datetime(2024, 1, 1)
+TOTAL = 23
+PER_PAGE = 5
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def reminders(request):
+    with tempfile.TemporaryDirectory() as directory:
+        if request.param == "memory":
+            database = MemoryDatabase()
+        else:
+            database = SQLiteDatabase(os.path.join(directory, "test.db"))
+        yield Document(database, "reminders", Reminder)
+        if request.param == "sqlite":
+            database.close()
+
+
+async def load(reminders):
+    # Repeated times so pages split between reminders the sort ties on
+    await reminders.bulk_insert(
+        [
+            {
+                "_id": i,
+                "time": NOW + datetime.timedelta(milliseconds=(i * 7 % TOTAL) // 3),
+                "user": 1,
+                "message": str(i),
+            }
+            for i in range(TOTAL)
+        ]
+        + [{"_id": TOTAL, "time": NOW, "user": 2, "message": "someone else's"}]
+    )
+
+
+async def skip_pages(reminders):
+    return [
+        await reminders.find_page(
+            {"user": 1}, LIST_SORT, PER_PAGE, skip=index * PER_PAGE
+        )
+        for index in range(-(-TOTAL // PER_PAGE))
+    ]
+
+
+def ids(pages):
+    return [[reminder.id for reminder in page] for page in pages]
+
+
+def test_keyset_pages_match_skip_pages(reminders):
+    async def run():
+        await load(reminders)
+        expected = await skip_pages(reminders)
+
+        forwards = [await reminders.find_page({"user": 1}, LIST_SORT, PER_PAGE)]
+        while len(forwards) < len(expected):
+            end = forwards[-1][-1]
+            forwards.append(
+                await reminders.find_page(
+                    {"user": 1}, LIST_SORT, PER_PAGE, after=(end.time, end.id)
+                )
+            )
+
+        backwards = [
+            await reminders.find_page(
+                {"user": 1}, LIST_SORT, TOTAL % PER_PAGE, last=True
+            )
+        ]
+        while len(backwards) < len(expected):
+            start = backwards[0][0]
+            backwards.insert(
+                0,
+                await reminders.find_page(
+                    {"user": 1}, LIST_SORT, PER_PAGE, before=(start.time, start.id)
+                ),
+            )
+        return expected, forwards, backwards
+
+    expected, forwards, backwards = asyncio.run(run())
+    assert sorted(sum(ids(expected), [])) == list(range(TOTAL))
+    assert ids(forwards) == ids(expected)
+    assert ids(backwards) == ids(expected)
+
+
+def test_state_resumes_at_the_same_page(reminders):
+    async def run():
+        await load(reminders)
+        expected = await skip_pages(reminders)
+
+        pages = ReminderPages(reminders, 1, TOTAL, 0, PER_PAGE)
+        for index in range(3):
+            await pages.fetch(index)
+        state = pages.state(2)
+
+        resumed = ReminderPages.from_state(reminders, 1, 2, state, color=0)
+        assert resumed is not None
+        assert resumed.total == TOTAL
+        assert resumed.state(2) == state
+        # Neighbouring pages are keyset queries off the restored bounds
+        after, before = await resumed.fetch(3), await resumed.fetch(1)
+        return expected, after, before
+
+    expected, after, before = asyncio.run(run())
+    assert ids([after, before]) == ids([expected[3], expected[1]])
+
+
+def test_state_without_bounds_keeps_only_the_total(reminders):
+    pages = ReminderPages(reminders, 1, TOTAL, 0, PER_PAGE)
+    resumed = ReminderPages.from_state(reminders, 1, 4, pages.state(4), color=0)
+    assert resumed.total == TOTAL
+    assert resumed.count == pages.count
+    assert resumed.state(4) == pages.state(4)
+
+
+@pytest.mark.parametrize("state", ["", "?", "1.2", "1.2.3.4.5.6", "1..2.3.4"])
+def test_state_that_is_not_ours_is_rejected(reminders, state):
+    assert ReminderPages.from_state(reminders, 1, 0, state, color=0) is None
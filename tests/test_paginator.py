@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+
+import pytest
+
+from cogs.module import LIST_SOURCE
+from utils.ids import MAX_ID
+from utils.pages import ReminderPages
+from utils.paginator import MAX_OPTIONS, PageButton, PageSelect, PageSource
+
+# Discord rejects longer custom_ids
+MAX_CUSTOM_ID = 100
+
+
+@pytest.mark.parametrize(
+    "count, current, expected",
+    [
+        (1, 0, range(0, 1)),
+        (10, 7, range(0, 10)),
+        (MAX_OPTIONS, 24, range(0, MAX_OPTIONS)),
+        (100, 0, range(0, 25)),
+        (100, 12, range(0, 25)),
+        (100, 50, range(38, 63)),
+        (100, 99, range(75, 100)),
+        (100, 90, range(75, 100)),
+    ],
+)
+def test_window_stays_within_the_pages(count, current, expected):
+    window = PageSource(count=count).window(current)
+    assert window == expected
+    assert current in window
+
+
+def test_window_size():
+    assert PageSource(count=100).window(50, 5) == range(48, 53)
+    assert PageSource(count=100).window(50, 4) == range(48, 52)
+
+
+def test_window_of_unknown_length_offers_one_page_past_the_furthest_seen():
+    async def render(index):
+        return f"page {index}" if index < 40 else None
+
+    async def run():
+        source = PageSource(render)
+        windows = [source.window(0)]
+        for index in range(30):
+            await source.get_page(index)
+        windows.append(source.window(29))
+        # Running past the end settles the count
+        await source.get_page(40)
+        windows.append(source.window(39))
+        return windows
+
+    assert asyncio.run(run()) == [range(0, 1), range(6, 31), range(15, 40)]
+
+
+def parse(cls, custom_id):
+    match = cls.__discord_ui_compiled_template__.fullmatch(custom_id)
+    return match and asyncio.run(cls.from_custom_id(None, None, match))
+
+
+def test_buttons_parse_back_from_their_custom_id():
+    button = PageButton("reminders", 1 << 62, 12, "n", "3.1H8.5")
+    parsed = parse(PageButton, button.custom_id)
+    assert (parsed.name, parsed.owner, parsed.page, parsed.action, parsed.state) == (
+        "reminders",
+        1 << 62,
+        12,
+        "n",
+        "3.1H8.5",
+    )
+    assert parse(PageButton, PageButton("r", 1, 0, "f").custom_id).state == ""
+
+    select = PageSelect("reminders", 7, 3, "AB.C")
+    parsed = parse(PageSelect, select.custom_id)
+    assert (parsed.name, parsed.owner, parsed.page, parsed.state) == (
+        "reminders",
+        7,
+        3,
+        "AB.C",
+    )
+    # Each only picks up its own custom_ids
+    assert parse(PageButton, select.custom_id) is None
+    assert parse(PageSelect, button.custom_id) is None
+
+
+@pytest.mark.parametrize(
+    "custom_id",
+    [
+        "pg:reminders:1:x:n:",
+        "pg:reminders:1:-1:n:",
+        "pg:reminders:1:0:n:a b",
+        "pg:reminders:1:0:n",
+        "xpg:reminders:1:0:n:",
+    ],
+)
+def test_malformed_custom_ids_are_not_ours(custom_id):
+    assert parse(PageButton, custom_id) is None
+
+
+def test_reminder_list_custom_ids_fit_discords_limit():
+    # The longest state: a huge list, a deep page, the largest
+    # owner and ids, and times far in the future
+    pages = ReminderPages(None, 1, 10**6, 0)
+    page = pages.count - 1
+    bounds = (datetime.datetime(2200, 1, 1), MAX_ID)
+    pages._starts[page] = pages._ends[page] = bounds
+    state = pages.state(page)
+    assert len(state.split(".")) == 5
+
+    owner = MAX_ID
+    custom_ids = [
+        PageButton(LIST_SOURCE, owner, page, action, state).custom_id
+        for action in "fpqnl"
+    ]
+    custom_ids.append(PageSelect(LIST_SOURCE, owner, page, state).custom_id)
+    assert max(map(len, custom_ids)) <= MAX_CUSTOM_ID
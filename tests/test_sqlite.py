@@ -0,0 +1,139 @@
+import asyncio
+import datetime
+import os
+import tempfile
+
+import pytest
+from pymongo import IndexModel, InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from utils.db import Document
+from utils.events import InsertEvent
+from utils.sqlite import SQLiteDatabase
+
+
+@pytest.fixture
+def db():
+    with tempfile.TemporaryDirectory() as directory:
+        database = SQLiteDatabase(os.path.join(directory, "test.db"))
+        yield database
+        database.close()
+
+
+def test_bulk_write_keeps_successful_writes(db):
+    async def run():
+        collection = db["items"]
+        await collection.insert_one({"_id": 1})
+        with pytest.raises(BulkWriteError) as error:
+            await collection.bulk_write(
+                [InsertOne({"_id": 2}), InsertOne({"_id": 1}), InsertOne({"_id": 3})],
+                ordered=False,
+            )
+        assert error.value.details["nInserted"] == 2
+        assert [e["index"] for e in error.value.details["writeErrors"]] == [1]
+        documents = await collection.find({}).sort("_id", 1).to_list(None)
+        return [d["_id"] for d in documents]
+
+    assert asyncio.run(run()) == [1, 2, 3]
+
+
+def test_bulk_insert_publishes_committed_writes(db):
+    async def run():
+        items = Document(db, "items")
+        inserted = []
+        items.subscribe(
+            lambda event: isinstance(event, InsertEvent)
+            and inserted.extend(d["_id"] for d in event.documents)
+        )
+        await items.insert({"_id": 1})
+        inserted.clear()
+        result = await items.bulk_insert([{"_id": 2}, {"_id": 1}, {"_id": 3}])
+        return result, inserted, sorted(d["_id"] for d in await items.get_all())
+
+    result, inserted, stored = asyncio.run(run())
+    assert result.inserted == 2
+    assert [e["index"] for e in result.errors] == [1]
+    assert sorted(inserted) == [2, 3]
+    assert stored == [1, 2, 3]
+
+
+@pytest.mark.parametrize(
+    "op, bound, expected",
+    [
+        ("$lt", 5500, [1]),
+        ("$lte", 5500, [1]),
+        ("$gt", 5500, [2]),
+        ("$gte", 5500, [2]),
+        ("$lt", 6000, [1]),
+        ("$lte", 6000, [1, 2]),
+        ("$gt", 5000, [2]),
+        ("$gte", 5000, [1, 2]),
+    ],
+)
+def test_range_bounds_below_a_millisecond(db, op, bound, expected):
+    start = datetime.datetime(2024, 1, 1)
+
+    async def run():
+        collection = db["items"]
+        await collection.create_indexes([IndexModel([("time", 1)])])
+        await collection.insert_many(
+            [
+                {"_id": 1, "time": start + datetime.timedelta(microseconds=5000)},
+                {"_id": 2, "time": start + datetime.timedelta(microseconds=6000)},
+            ]
+        )
+        query = {"time": {op: start + datetime.timedelta(microseconds=bound)}}
+        documents = await collection.find(query).sort("_id", 1).to_list(None)
+        return [d["_id"] for d in documents]
+
+    assert asyncio.run(run()) == expected
+
+
+def test_find_one_ignores_a_callers_limit(db):
+    async def run():
+        collection = db["items"]
+        await collection.insert_many([{"_id": 1}, {"_id": 2}])
+        return await collection.find_one({}, sort=[("_id", -1)], limit=5)
+
+    assert asyncio.run(run()) == {"_id": 2}
+
+
+def test_duplicate_key_errors_name_the_violated_index(db):
+    async def run():
+        collection = db["items"]
+        await collection.create_indexes(
+            [
+                IndexModel([("name", 1)], unique=True),
+                IndexModel([("a", 1), ("b", -1)], unique=True, name="a_b"),
+            ]
+        )
+        await collection.insert_one({"_id": 1, "name": "x", "a": 1, "b": 2})
+        await collection.insert_one({"_id": 2, "name": "y"})
+        writes = [
+            collection.insert_one({"_id": 1}),
+            collection.insert_one({"_id": 3, "name": "x"}),
+            collection.insert_one({"_id": 3, "a": 1, "b": 2}),
+            collection.update_one({"_id": 2}, {"$set": {"name": "x"}}),
+        ]
+        details = []
+        for write in writes:
+            with pytest.raises(DuplicateKeyError) as error:
+                await write
+            assert error.value.code == 11000
+            details.append(error.value.details)
+
+        with pytest.raises(BulkWriteError) as error:
+            await collection.bulk_write([InsertOne({"_id": 3, "name": "y"})])
+        details.append(error.value.details["writeErrors"][0])
+        return details
+
+    details = asyncio.run(run())
+    assert [(d["keyPattern"], d["keyValue"]) for d in details] == [
+        ({"_id": 1}, {"_id": 1}),
+        ({"name": 1}, {"name": "x"}),
+        ({"a": 1, "b": -1}, {"a": 1, "b": 2}),
+        ({"name": 1}, {"name": "x"}),
+        ({"name": 1}, {"name": "y"}),
+    ]
+    assert "index: a_b " in details[2]["errmsg"]
+    assert details[-1]["index"] == 0
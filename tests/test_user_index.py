@@ -0,0 +1,44 @@
+import datetime
+
+from utils.events import DeleteEvent, InsertEvent, UpdateEvent
+from utils.models import Reminder
+from utils.user_index import UserReminderIndex
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+def reminder(_id, user=1, message="water the plants"):
+    return {"_id": _id, "user": user, "time": NOW, "message": message}
+
+
+def test_unrelated_writes_during_a_load_keep_it():
+    index = UserReminderIndex()
+    generation = index.generation
+    index.apply(InsertEvent("reminders", [reminder(10, user=2)]))
+    index.apply(UpdateEvent("reminders", [1], {"lease_owner": "a", "attempts": 1}))
+
+    assert index.load(1, [Reminder(**reminder(1))], generation)
+    assert index.owns(1, 1)
+    assert index.owns(1, 10) is False
+
+
+def test_writes_during_a_load_are_replayed():
+    index = UserReminderIndex()
+    generation = index.generation
+    read = [Reminder(**reminder(1)), Reminder(**reminder(2))]
+    index.apply(InsertEvent("reminders", [reminder(3, message="feed the cat")]))
+    index.apply(DeleteEvent("reminders", [2]))
+    index.apply(UpdateEvent("reminders", [1], {"message": "water the garden"}))
+
+    assert index.load(1, read, generation)
+    assert [r.id for r in index.search(1)] == [1, 3]
+    assert [r.id for r in index.search(1, "garden")] == [1]
+
+
+def test_unreplayable_writes_during_a_load_discard_it():
+    index = UserReminderIndex()
+    generation = index.generation
+    index.apply(DeleteEvent("reminders", None, {"user": 1}))
+
+    assert not index.load(1, [Reminder(**reminder(1))], generation)
+    assert index.owns(1, 1) is None
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.operations import InsertOne, UpdateOne
+
+from utils.events import InsertEvent, UpdateEvent
+
+if TYPE_CHECKING:
+    from utils.db import Document
+
+log = logging.getLogger(__name__)
+
+__all__ = ["WriteBuffer"]
+
+# Operators whose effect can be folded into a pending insert
+_FOLDABLE = {"$set", "$unset", "$inc"}
+
+
+class _PendingWrite:
+    __slots__ = ("kind", "document", "update", "upsert")
+
+    def __init__(
+        self,
+        kind: str,
+        document: Optional[Dict[str, Any]] = None,
+        update: Optional[Dict[str, Dict[str, Any]]] = None,
+        upsert: bool = False,
+    ):
+        self.kind = kind
+        self.document = document
+        self.update = update
+        self.upsert = upsert
+
+    def merge(self, other: "_PendingWrite") -> "_PendingWrite":
+        """
+        The single write with the effect of this write followed
+        by `other`, or ``self`` unchanged if they can't be merged.
+        """
+        if other.kind != "update":
+            return self
+
+        if self.kind == "insert":
+            if not set(other.update) <= _FOLDABLE or _nested(other.update):
+                return self
+            document = dict(self.document)
+            for field, value in other.update.get("$set", {}).items():
+                document[field] = value
+            for field in other.update.get("$unset", {}):
+                document.pop(field, None)
+            for field, value in other.update.get("$inc", {}).items():
+                document[field] = document.get(field, 0) + value
+            return _PendingWrite("insert", document=document)
+
+        if self.kind == "update":
+            update = _merge_updates(self.update, other.update)
+            if update is None:
+                return self
+            return _PendingWrite(
+                "update", update=update, upsert=self.upsert or other.upsert
+            )
+
+        return self
+
+
+def _nested(update: Dict[str, Dict[str, Any]]) -> bool:
+    return any("." in field for values in update.values() for field in values)
+
+
+def _merge_updates(
+    first: Dict[str, Dict[str, Any]], second: Dict[str, Dict[str, Any]]
+) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Fold two updates into one, ``None`` if they touch a field differently."""
+    merged = {operator: dict(values) for operator, values in first.items()}
+    for operator, values in second.items():
+        for field, value in values.items():
+            owner = next(
+                (op for op, fields in merged.items() if field in fields), operator
+            )
+            if owner != operator:
+                return None
+            if operator == "$inc" and field in merged.get("$inc", {}):
+                value = merged["$inc"][field] + value
+            elif operator not in ("$set", "$unset", "$inc"):
+                if field in merged.get(operator, {}):
+                    return None
+            merged.setdefault(operator, {})[field] = value
+    return merged
+
+
+class WriteBuffer:
+    """
+    Collects single item writes made through a Document and
+    sends them as unordered ``bulk_write`` calls.
+
+    Writes to the same _id are merged while they wait, so an insert
+    followed by a ``$set`` is sent as one insert. Writes that can't
+    be merged start a new batch, and batches are sent in order, so
+    the end state matches sending every write as it was made.
+
+    Events for the writes are published once they have landed.
+
+    Parameters
+    ----------
+    document: Document
+        The Document to write through
+    max_delay: float
+        Seconds a write may wait before its batch is sent
+    max_writes: int
+        Send as soon as this many writes are waiting
+    """
+
+    def __init__(
+        self, document: "Document", max_delay: float = 0.005, max_writes: int = 1000
+    ):
+        self.document = document
+        self.max_delay = max_delay
+        self.max_writes = max_writes
+        self._batches: List[Dict[Any, _PendingWrite]] = []
+        self._pending = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._pending
+
+    def __contains__(self, _id: Any) -> bool:
+        """Whether a write to `_id` is waiting."""
+        return any(_id in batch for batch in self._batches)
+
+    def insert(self, document: Dict[str, Any]) -> None:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        self._add(document["_id"], _PendingWrite("insert", document=dict(document)))
+
+    def update(
+        self, _id: Any, update: Dict[str, Dict[str, Any]], upsert: bool = False
+    ) -> None:
+        update = {operator: dict(values) for operator, values in update.items()}
+        self._add(_id, _PendingWrite("update", update=update, upsert=upsert))
+
+    async def flush(self) -> None:
+        """
+        Send every waiting write.
+
+        Writes the server rejected are dropped and the first
+        rejection is raised once the rest have been sent. Batches
+        that failed to send at all stay queued for the next flush.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        error: Optional[BulkWriteError] = None
+        async with self._lock:
+            while self._batches:
+                batch = self._batches.pop(0)
+                self._pending -= len(batch)
+                try:
+                    await self._write(batch)
+                except BulkWriteError as e:
+                    error = error or e
+                except Exception:
+                    self._batches.insert(0, batch)
+                    self._pending += len(batch)
+                    raise
+        if error is not None:
+            raise error
+
+    async def close(self) -> None:
+        """Send every waiting write and stop flushing in the background."""
+        await self.flush()
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+
+    def _add(self, _id: Any, write: _PendingWrite) -> None:
+        batch = self._batches[-1] if self._batches else None
+        if batch is not None and _id in batch:
+            merged = batch[_id].merge(write)
+            if merged is not batch[_id]:
+                batch[_id] = merged
+                return
+            batch = None
+
+        if batch is None:
+            batch = {}
+            self._batches.append(batch)
+        batch[_id] = write
+        self._pending += 1
+
+        if self._pending >= self.max_writes:
+            self._flush_soon()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        await self._flush_logged()
+
+    def _flush_soon(self) -> None:
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self._flush_logged())
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            log.exception("Buffered writes to %s failed", self.document.document_name)
+
+    async def _write(self, batch: Dict[Any, _PendingWrite]) -> None:
+        if not batch:
+            return
+
+        ids = list(batch)
+        requests = []
+        for _id, write in batch.items():
+            if write.kind == "insert":
+                requests.append(InsertOne(write.document))
+            else:
+                requests.append(
+                    UpdateOne({"_id": _id}, write.update, upsert=write.upsert)
+                )
+
+        failed: Set[int] = set()
+        started = time.perf_counter()
+        try:
+            await self.document.raw_collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            self._record(started, len(ids) - len(failed), failed=True)
+            self._publish(batch, ids, failed)
+            raise
+        except BaseException:
+            self._record(started, 0, failed=True)
+            raise
+        self._record(started, len(ids))
+        self._publish(batch, ids, failed)
+
+    def _record(self, started: float, items: int, failed: bool = False) -> None:
+        self.document.record(
+            "buffered_write", time.perf_counter() - started, items, failed=failed
+        )
+
+    def _publish(
+        self, batch: Dict[Any, _PendingWrite], ids: List[Any], failed: Set[int]
+    ) -> None:
+        name = self.document.document_name
+        inserted = []
+        for index, _id in enumerate(ids):
+            if index in failed:
+                continue
+            write = batch[_id]
+            if write.kind == "insert":
+                inserted.append(write.document)
+            else:
+                self.document.events.publish(
+                    UpdateEvent.from_update(
+                        name, {"_id": _id}, write.update, write.upsert
+                    )
+                )
+
+        if inserted:
+            self.document.events.publish(InsertEvent(name, inserted))
@@ -1,12 +1,59 @@
+import asyncio
+import datetime
 import functools
+import inspect
+import logging
+import time
+import uuid
+from contextvars import ContextVar
 from copy import deepcopy
-from typing import List, Dict, Optional, Union, Any, TypeVar, Type
-
+from typing import (
+    List,
+    Dict,
+    Optional,
+    Union,
+    Any,
+    TypeVar,
+    Type,
+    Tuple,
+    Set,
+    AsyncIterator,
+    Callable,
+    Hashable,
+)
+
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
 from pymongo.results import DeleteResult
-from pymongo.operations import UpdateOne
+from pymongo.operations import DeleteMany, InsertOne, UpdateOne
+
+from utils.buffer import WriteBuffer
+from utils.metrics import OperationStats
+from utils.events import (
+    DeleteEvent,
+    DocumentEvent,
+    EventBus,
+    InsertEvent,
+    UpdateEvent,
+    ids_from_filter,
+)
+
+log = logging.getLogger(__name__)
 
 T = TypeVar("T")
+_MISSING = object()
+# How many distinct query shapes a Document remembers for explain
+MAX_RECORDED_QUERIES = 64
+# Operations slower than this many seconds are logged
+SLOW_QUERY_SECONDS = 0.1
+# The server takes up to 100,000 writes per batch, smaller
+# chunks keep the size of each round trip down
+BULK_CHUNK_SIZE = 10_000
+# The task inside a timed Document call, so the
+# calls it makes through other methods aren't counted twice
+_timing: ContextVar[Optional[asyncio.Task]] = ContextVar("_timing", default=None)
 
 
 def return_converted(func):
@@ -25,18 +72,231 @@ def return_converted(func):
         if not data or not self.converter:
             return data
 
+        converter = self.converter
         if not isinstance(data, list):
-            return self.converter(**data)
+            return converter(**data)
 
-        new_data = []
-        for d in data:
-            new_data.append(self.converter(**d))
+        return [converter(**d) for d in data]
 
-        return new_data
+    return wrapped
+
+
+def timed(func):
+    """
+    Record how long each call to this Document
+    method takes and how many items it handled,
+    see :meth:`Document.record`.
+    """
+    signature = inspect.signature(func)
+
+    def filter_of(args, kwargs) -> Any:
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+        for name in ("filter_dict", "data_id", "_id", "data"):
+            if name in arguments:
+                return arguments[name]
+        return None
+
+    if inspect.isasyncgenfunction(func):
+
+        @functools.wraps(func)
+        async def wrapped_iterator(*args, **kwargs):
+            self: Document = args[0]
+            items = 0
+            failed = False
+            started = time.perf_counter()
+            try:
+                async for item in func(*args, **kwargs):
+                    items += 1
+                    yield item
+            except GeneratorExit:
+                # The caller stopped early, which is no failure
+                raise
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                self.record(
+                    func.__name__,
+                    time.perf_counter() - started,
+                    items,
+                    lambda: filter_of(args, kwargs),
+                    failed,
+                )
+
+        return wrapped_iterator
+
+    @functools.wraps(func)
+    async def wrapped(*args, **kwargs):
+        task = asyncio.current_task()
+        if _timing.get() is task:
+            return await func(*args, **kwargs)
+
+        self: Document = args[0]
+        token = _timing.set(task)
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException:
+            self.record(
+                func.__name__,
+                time.perf_counter() - started,
+                0,
+                lambda: filter_of(args, kwargs),
+                failed=True,
+            )
+            raise
+        finally:
+            _timing.reset(token)
+
+        self.record(
+            func.__name__,
+            time.perf_counter() - started,
+            _result_size(result),
+            lambda: filter_of(args, kwargs),
+        )
+        return result
 
     return wrapped
 
 
+def _result_size(result: Any) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    if isinstance(result, DeleteResult):
+        return result.deleted_count
+    if isinstance(result, BulkResult):
+        return result.written
+    return 1
+
+
+class BulkResult:
+    """
+    The combined outcome of a bulk write sent in chunks.
+
+    Attributes
+    ----------
+    inserted: int
+        How many items were inserted
+    matched: int
+        How many items the updates matched
+    modified: int
+        How many items the updates changed
+    upserted: int
+        How many items the upserts inserted
+    deleted: int
+        How many items were deleted
+    upserted_ids: Dict[int, Any]
+        The _id of each upserted item, by its index in the input
+    errors: List[Dict[str, Any]]
+        The server's error for each write that failed,
+        ``index`` is the item's index in the input
+    """
+
+    __slots__ = (
+        "inserted",
+        "matched",
+        "modified",
+        "upserted",
+        "deleted",
+        "upserted_ids",
+        "errors",
+    )
+
+    def __init__(self):
+        self.inserted = 0
+        self.matched = 0
+        self.modified = 0
+        self.upserted = 0
+        self.deleted = 0
+        self.upserted_ids: Dict[int, Any] = {}
+        self.errors: List[Dict[str, Any]] = []
+
+    def __repr__(self):
+        return (
+            f"<BulkResult(inserted={self.inserted}, matched={self.matched}, "
+            f"modified={self.modified}, upserted={self.upserted}, "
+            f"deleted={self.deleted}, errors={len(self.errors)})>"
+        )
+
+    @property
+    def written(self) -> int:
+        """How many items were inserted, changed, upserted or deleted."""
+        return self.inserted + self.modified + self.upserted + self.deleted
+
+    def add(self, result: Any, offset: int) -> None:
+        """Add a ``BulkWriteResult`` for the chunk starting at `offset`."""
+        self.inserted += result.inserted_count
+        self.matched += result.matched_count
+        self.modified += result.modified_count
+        self.upserted += result.upserted_count
+        self.deleted += result.deleted_count
+        for index, _id in (result.upserted_ids or {}).items():
+            self.upserted_ids[offset + index] = _id
+
+    def add_error(self, details: Dict[str, Any], offset: int) -> None:
+        """Add the details of a ``BulkWriteError`` for the chunk at `offset`."""
+        self.inserted += details.get("nInserted", 0)
+        self.matched += details.get("nMatched", 0)
+        self.modified += details.get("nModified", 0)
+        self.upserted += details.get("nUpserted", 0)
+        self.deleted += details.get("nRemoved", 0)
+        for upserted in details.get("upserted", []):
+            self.upserted_ids[offset + upserted["index"]] = upserted["_id"]
+        for error in details.get("writeErrors", []):
+            self.errors.append({**error, "index": offset + error["index"]})
+
+
+def _shape(value: Any) -> Hashable:
+    """`value` with every literal replaced by its type name."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _shape(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, (dict, list, tuple)) for v in value):
+            return tuple(_shape(v) for v in value)
+        return "list"
+    return type(value).__name__
+
+
+def _keyset(
+    sort: List[Tuple[str, int]], key: Tuple[Any, ...], after: bool
+) -> Dict[str, Any]:
+    """
+    A filter matching the items sorted after
+    (or before) the item whose sort fields are `key`.
+    """
+    clauses = []
+    for index, (field, direction) in enumerate(sort):
+        clause = {name: value for (name, _), value in zip(sort[:index], key)}
+        clause[field] = {"$gt" if (direction > 0) == after else "$lt": key[index]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def plan_stages(explanation: Dict[str, Any]) -> List[str]:
+    """
+    The stages of the winning plan in an explain output,
+    outermost first, e.g. ``["FETCH", "IXSCAN"]``.
+    """
+    plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+    # The slot based engine nests the classic plan one level down
+    plan = plan.get("queryPlan", plan)
+
+    stages = []
+    pending = [plan]
+    while pending:
+        stage = pending.pop(0)
+        if "stage" in stage:
+            stages.append(stage["stage"])
+        if "inputStage" in stage:
+            pending.append(stage["inputStage"])
+        pending.extend(stage.get("inputStages", []))
+    return stages
+
+
 class Document:
     _version = 9.1
 
@@ -45,6 +305,8 @@ class Document:
         database: AsyncIOMotorDatabase,
         document_name: str,
         converter: Optional[Type[T]] = None,
+        indexes: Optional[List[IndexModel]] = None,
+        slow_query: Optional[float] = SLOW_QUERY_SECONDS,
     ):
         """
         Parameters
@@ -56,20 +318,148 @@ class Document:
         converter: Optional[Type[T]]
             An optional converter to try
             convert all data-types which
-            return either Dict or List into
+            return either Dict or List into.
+            Reads with a projection only pass
+            the projected fields, so it should
+            default any field it can go without
+        indexes: Optional[List[IndexModel]]
+            The indexes this collection's queries rely on,
+            created by :meth:`ensure_indexes`
+        slow_query: Optional[float]
+            Log operations taking longer than this
+            many seconds, ``None`` to never log
         """
         self._document_name: str = document_name
         self._database: AsyncIOMotorDatabase = database
         self._document: AsyncIOMotorCollection = database[document_name]
 
         self.converter: Type[T] = converter
+        self.events: EventBus = EventBus()
+        self.write_buffer: Optional[WriteBuffer] = None
+        self.indexes: List[IndexModel] = list(indexes or [])
+        self.queries: Dict[Hashable, Tuple[Dict[str, Any], Optional[List]]] = {}
+        self.slow_query: Optional[float] = slow_query
+        self.stats: Dict[str, OperationStats] = {}
 
     def __repr__(self):
         return f"<Document(document_name={self.document_name})>"
 
+    # <-- Events -->
+    def subscribe(self, callback, *event_types: Type[DocumentEvent]) -> None:
+        """
+        Call `callback` with an event after every
+        write this Document makes.
+
+        Parameters
+        ----------
+        callback: Callable[[DocumentEvent], Any]
+            Called with each event, may be a coroutine function
+        event_types: Type[DocumentEvent]
+            Only deliver these types of event,
+            e.g. ``InsertEvent``. Defaults to all events.
+        """
+        self.events.subscribe(callback, *event_types)
+
+    def unsubscribe(self, callback) -> None:
+        self.events.unsubscribe(callback)
+
+    # <-- Instrumentation -->
+    def record(
+        self,
+        operation: str,
+        seconds: float,
+        items: int = 0,
+        filter_dict: Union[Dict, Any, Callable[[], Any]] = None,
+        failed: bool = False,
+    ) -> None:
+        """
+        Count one call of `operation` in :attr:`stats`,
+        logging it if it was slower than :attr:`slow_query`.
+
+        Every public method records itself,
+        this is for work done outside of them.
+
+        Parameters
+        ----------
+        operation: str
+            What was done, usually the method name
+        seconds: float
+            How long it took
+        items: int
+            How many items were returned, deleted or sent
+        filter_dict: Union[Dict, Any, Callable[[], Any]]
+            The filter used, logged by its shape. May be a
+            callable returning it, which is only called when
+            the operation is slow
+        failed: bool
+            Whether it raised
+        """
+        slow = self.slow_query is not None and seconds >= self.slow_query
+        stats = self.stats.get(operation)
+        if stats is None:
+            stats = self.stats[operation] = OperationStats()
+        stats.observe(seconds, items, failed, slow)
+
+        if slow:
+            if callable(filter_dict):
+                filter_dict = filter_dict()
+            log.warning(
+                "Slow %s on %s took %.3fs for %d items, filter %s",
+                operation,
+                self.document_name,
+                seconds,
+                items,
+                None if filter_dict is None else _shape(filter_dict),
+            )
+
+    def reset_stats(self) -> None:
+        self.stats.clear()
+
+    # <-- Write buffering -->
+    def buffer_writes(
+        self, max_delay: float = 0.005, max_writes: int = 1000
+    ) -> WriteBuffer:
+        """
+        Queue single item writes and send them in bulk.
+
+        Once enabled, ``insert`` and updates, unsets and increments
+        made by a plain ``{"_id": ...}`` filter are queued on a
+        :class:`WriteBuffer` and return straight away. Deletes are
+        sent at once so they can report whether anything matched.
+        Every other call sends the queued writes first, so reads
+        always see them and writes stay in order.
+
+        Call :meth:`flush` before shutting down.
+
+        Parameters
+        ----------
+        max_delay: float
+            Seconds a write may wait before it is sent
+        max_writes: int
+            Send as soon as this many writes are waiting
+
+        Returns
+        -------
+        WriteBuffer
+            The buffer writes are queued on
+        """
+        if self.write_buffer is None:
+            self.write_buffer = WriteBuffer(self, max_delay, max_writes)
+        return self.write_buffer
+
+    @timed
+    async def flush(self) -> None:
+        """
+        Send every queued write, raising
+        the first one the server rejected.
+        """
+        if self.write_buffer is not None:
+            await self.write_buffer.flush()
+
     # <-- Pointer Methods -->
+    @timed
     async def find(
-        self, filter_dict: Union[Dict, Any]
+        self, filter_dict: Union[Dict, Any], projection: Optional[Dict[str, Any]] = None
     ) -> Optional[Union[Dict[str, Any], Type[T]]]:
         """
         Find and return one item.
@@ -80,6 +470,9 @@ class Document:
             The _id of the item to find,
             if a Dict is passed that is
             used as the filter.
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
 
         Returns
         -------
@@ -87,8 +480,9 @@ class Document:
             The result of the query
         """
         filter_dict = self.__convert_filter(filter_dict)
-        return await self.find_by_custom(filter_dict)
+        return await self.find_by_custom(filter_dict, projection)
 
+    @timed
     async def delete(self, filter_dict: Union[Dict, Any]) -> Optional[DeleteResult]:
         """
         Delete an item from the Document
@@ -109,6 +503,7 @@ class Document:
         filter_dict = self.__convert_filter(filter_dict)
         return await self.delete_by_custom(filter_dict)
 
+    @timed
     async def update(
         self,
         filter_dict: Union[Dict, Any],
@@ -143,9 +538,14 @@ class Document:
         await self.update_by_custom(filter_dict, data, *args, **kwargs)
 
     # <-- Actual Methods -->
+    @timed
     @return_converted
     async def get_all(
-        self, filter_dict: Optional[Dict[str, Any]] = None, *args: Any, **kwargs: Any
+        self,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        *args: Any,
+        **kwargs: Any,
     ) -> List[Optional[Union[Dict[str, Any], Type[T]]]]:
         """
         Fetches and returns all items
@@ -155,6 +555,9 @@ class Document:
         ----------
         filter_dict: Optional[Dict[str, Any]]
             What to filter based on
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
 
         Returns
         -------
@@ -162,12 +565,20 @@ class Document:
             The items matching the filter
         """
         filter_dict = filter_dict or {}
+        await self.__flush_writes()
+        self.__record_query(filter_dict, kwargs.get("sort"))
 
-        return await self._document.find(filter_dict, *args, **kwargs).to_list(None)
+        return await self._document.find(
+            filter_dict, projection, *args, **kwargs
+        ).to_list(None)
 
+    @timed
     @return_converted
     async def get_all_where_field_exists(
-        self, field: Any, where_field_doesnt_exist: bool = False
+        self,
+        field: Any,
+        where_field_doesnt_exist: bool = False,
+        projection: Optional[Dict[str, Any]] = None,
     ) -> List[Optional[Union[Dict[str, Any], Type[T]]]]:
         """
         Return all of the documents which
@@ -186,30 +597,140 @@ class Document:
             in the main doc description.
 
             Defaults to ``False``
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
 
         Returns
         -------
 
         """
         existence = not where_field_doesnt_exist
-        return await self._document.find({field: {"$exists": existence}}).to_list(None)
+        await self.__flush_writes()
+        self.__record_query({field: {"$exists": existence}})
+        return await self._document.find(
+            {field: {"$exists": existence}}, projection
+        ).to_list(None)
+
+    @timed
+    async def bulk_update(
+        self,
+        data: List[Dict],
+        option: str = "set",
+        ordered: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """
+        Bulk update documents by _id,
+        items that don't exist are left alone.
 
-    @return_converted
-    async def bulk_update(self, data: List[Dict]):
+        Parameters
+        ----------
+        data: List[Dict]
+            The data to update with, each
+            item must contain its _id
+        option: str
+            The optional option to pass to mongo,
+            default is set
+        ordered: bool
+            Stop at the first failed write instead
+            of carrying on with the rest
+        chunk_size: int
+            How many writes to send in a single round trip
+
+        Returns
+        -------
+        BulkResult
+            The combined counts and any per item errors
         """
-        Bulk update documents
+        return await self.__bulk_update(data, option, False, ordered, chunk_size)
+
+    @timed
+    async def bulk_upsert(
+        self,
+        data: List[Dict],
+        option: str = "set",
+        ordered: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """
+        Bulk update documents by _id,
+        inserting the items that don't exist.
 
         Parameters
         ----------
         data: List[Dict]
-            The data to update with
+            The data to upsert, each
+            item must contain its _id
+        option: str
+            The optional option to pass to mongo,
+            default is set
+        ordered: bool
+            Stop at the first failed write instead
+            of carrying on with the rest
+        chunk_size: int
+            How many writes to send in a single round trip
+
+        Returns
+        -------
+        BulkResult
+            The combined counts and any per item errors
         """
-        bulk_operations = [UpdateOne({"_id": d["_id"]}, {"$set": d}) for d in data]
-        await self._document.bulk_write(bulk_operations)
+        return await self.__bulk_update(data, option, True, ordered, chunk_size)
 
-    @return_converted
+    @timed
+    async def bulk_delete(
+        self,
+        items: List[Union[Dict, Any]],
+        ordered: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> BulkResult:
+        """
+        Delete everything matching any of the given filters.
+
+        Unlike :meth:`delete_many` each filter is its own
+        write, so failures are reported per item.
+
+        Parameters
+        ----------
+        items: List[Union[Dict, Any]]
+            The _id's of the items to delete,
+            if a Dict is passed that is
+            used as the filter.
+        ordered: bool
+            Stop at the first failed delete instead
+            of carrying on with the rest
+        chunk_size: int
+            How many deletes to send in a single round trip
+
+        Returns
+        -------
+        BulkResult
+            The combined counts and any per item errors
+        """
+        filters = [self.__convert_filter(item) for item in items]
+        await self.__flush_writes()
+
+        def published(indexes: List[int]) -> None:
+            ids = []
+            for index in indexes:
+                filter_ids = ids_from_filter(filters[index])
+                if filter_ids is None:
+                    self.events.publish(
+                        DeleteEvent(self.document_name, None, filters[index])
+                    )
+                else:
+                    ids.extend(filter_ids)
+            if ids:
+                self.events.publish(DeleteEvent(self.document_name, ids))
+
+        return await self.__bulk_write(
+            [DeleteMany(f) for f in filters], ordered, chunk_size, published
+        )
+
+    @timed
     async def find_by_id(
-        self, data_id: Any
+        self, data_id: Any, projection: Optional[Dict[str, Any]] = None
     ) -> Optional[Union[Dict[str, Any], Type[T]]]:
         """
         Find and return one item.
@@ -218,17 +739,21 @@ class Document:
         ----------
         data_id: Any
             The _id of the item to find
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
 
         Returns
         -------
         Optional[Union[Dict[str, Any], Type[T]]]
             The result of the query
         """
-        return await self.find_by_custom({"_id": data_id})
+        return await self.find_by_custom({"_id": data_id}, projection)
 
+    @timed
     @return_converted
     async def find_by_custom(
-        self, filter_dict: Dict[str, Any]
+        self, filter_dict: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
     ) -> Optional[Union[Dict[str, Any], Type[T]]]:
         """
         Find and return one item.
@@ -237,6 +762,9 @@ class Document:
         ----------
         filter_dict: Dict[str, Any]
             What to filter/find based on
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
 
         Returns
         -------
@@ -244,12 +772,15 @@ class Document:
             The result of the query
         """
         self.__ensure_dict(filter_dict)
+        await self.__flush_writes()
+        self.__record_query(filter_dict)
 
-        return await self._document.find_one(filter_dict)
+        return await self._document.find_one(filter_dict, projection)
 
+    @timed
     @return_converted
     async def find_many_by_custom(
-        self, filter_dict: Dict[str, Any]
+        self, filter_dict: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
     ) -> List[Union[Dict[str, Any], Type[T]]]:
         """
         Find and return all items
@@ -259,6 +790,9 @@ class Document:
         ----------
         filter_dict: Dict[str, Any]
             What to filter/find based on
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
 
         Returns
         -------
@@ -266,9 +800,291 @@ class Document:
             The result of the query
         """
         self.__ensure_dict(filter_dict)
+        await self.__flush_writes()
+        self.__record_query(filter_dict)
+
+        return await self._document.find(filter_dict, projection).to_list(None)
+
+    @timed
+    @return_converted
+    async def find_page(
+        self,
+        filter_dict: Dict[str, Any],
+        sort: List[Tuple[str, int]],
+        limit: int,
+        after: Optional[Tuple[Any, ...]] = None,
+        before: Optional[Tuple[Any, ...]] = None,
+        last: bool = False,
+        skip: int = 0,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> List[Union[Dict[str, Any], Type[T]]]:
+        """
+        Fetch one page of a sorted query.
 
-        return await self._document.find(filter_dict).to_list(None)
+        Pages are found by keyset: rather than skipping the
+        items on earlier pages, the query picks up right after
+        the last item of the previous page (or right before
+        the first item of the next one), so every page costs
+        the same however deep it is. ``_id`` is added to the
+        end of `sort` when missing so the order is total.
 
+        Parameters
+        ----------
+        filter_dict: Dict[str, Any]
+            What to filter/find based on
+        sort: List[Tuple[str, int]]
+            A list of (key, direction) pairs to sort by,
+            the sort fields shouldn't be missing or null
+        limit: int
+            The most items on a page
+        after: Optional[Tuple[Any, ...]]
+            The sort field values, _id last, of the
+            item the page starts after
+        before: Optional[Tuple[Any, ...]]
+            The sort field values, _id last, of the
+            item the page ends before
+        last: bool
+            Fetch the last `limit` items instead
+        skip: int
+            How many items to skip first, for jumping
+            to a page no neighbouring key is known for
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
+
+        Returns
+        -------
+        List[Union[Dict[str, Any], Type[T]]]
+            The items on the page, in `sort` order
+        """
+        self.__ensure_dict(filter_dict)
+        if all(field != "_id" for field, _ in sort):
+            sort = [*sort, ("_id", 1)]
+
+        backwards = before is not None or last
+        if after is not None:
+            filter_dict = {"$and": [filter_dict, _keyset(sort, after, True)]}
+        elif before is not None:
+            filter_dict = {"$and": [filter_dict, _keyset(sort, before, False)]}
+        query_sort = [(f, -d) for f, d in sort] if backwards else sort
+
+        await self.__flush_writes()
+        self.__record_query(filter_dict, query_sort)
+        page = await self._document.find(
+            filter_dict, projection, sort=query_sort, skip=skip, limit=limit
+        ).to_list(None)
+        if backwards:
+            page.reverse()
+        return page
+
+    @timed
+    async def count(self, filter_dict: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Count the items matching the given filter.
+
+        Parameters
+        ----------
+        filter_dict: Optional[Dict[str, Any]]
+            What to filter based on
+
+        Returns
+        -------
+        int
+            How many items match
+        """
+        filter_dict = filter_dict or {}
+        await self.__flush_writes()
+        self.__record_query(filter_dict)
+        return await self._document.count_documents(filter_dict)
+
+    def iter_all(
+        self,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        batch_size: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Union[Dict[str, Any], Type[T]]]:
+        """
+        Iterate over all items which match
+        the given filter, as they arrive.
+
+        Unlike `get_all` this never holds the
+        whole result, use it with ``async for``.
+
+        Parameters
+        ----------
+        filter_dict: Optional[Dict[str, Any]]
+            What to filter based on
+        sort: Optional[List[Tuple[str, int]]]
+            A list of (key, direction) pairs to sort by
+        limit: int
+            The most items to return, 0 for no limit
+        batch_size: Optional[int]
+            How many items to fetch per round trip
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
+        kwargs: Any
+            Passed through to the underlying find
+
+        Yields
+        ------
+        Union[Dict[str, Any], Type[T]]
+            Each item, converted if we have a converter
+        """
+        return self.iter_many(
+            filter_dict or {}, sort, limit, batch_size, projection, **kwargs
+        )
+
+    @timed
+    async def iter_many(
+        self,
+        filter_dict: Dict[str, Any],
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        batch_size: Optional[int] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Union[Dict[str, Any], Type[T]]]:
+        """
+        Iterate over the items matching
+        the given filter, as they arrive.
+
+        Parameters
+        ----------
+        filter_dict: Dict[str, Any]
+            What to filter/find based on
+        sort: Optional[List[Tuple[str, int]]]
+            A list of (key, direction) pairs to sort by
+        limit: int
+            The most items to return, 0 for no limit
+        batch_size: Optional[int]
+            How many items to fetch per round trip
+        projection: Optional[Dict[str, Any]]
+            The fields to include (``{"field": 1}``) or
+            exclude (``{"field": 0}``), defaults to all fields
+        kwargs: Any
+            Passed through to the underlying find
+
+        Yields
+        ------
+        Union[Dict[str, Any], Type[T]]
+            Each item, converted if we have a converter
+        """
+        self.__ensure_dict(filter_dict)
+
+        if batch_size:
+            kwargs["batch_size"] = batch_size
+        await self.__flush_writes()
+        self.__record_query(filter_dict, sort)
+        cursor = self._document.find(
+            filter_dict, projection, sort=sort, limit=limit, **kwargs
+        )
+        async for data in cursor:
+            yield self.converter(**data) if self.converter else data
+
+    @timed
+    @return_converted
+    async def claim(
+        self,
+        filter_dict: Dict[str, Any],
+        owner: str,
+        lease: float,
+        limit: int,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> List[Union[Dict[str, Any], Type[T]]]:
+        """
+        Atomically lease up to `limit` items matching
+        the filter which no one else currently holds.
+
+        Each claimed item gets ``lease_owner``, ``lease_token``
+        and ``lease_until`` set and its ``attempts`` incremented.
+        An item whose lease has expired can be claimed again,
+        so work held by a dead process is picked up by another.
+
+        Parameters
+        ----------
+        filter_dict: Dict[str, Any]
+            What to filter/find based on
+        owner: str
+            A name for the process claiming the items
+        lease: float
+            How many seconds the claim is held for
+        limit: int
+            The most items to claim
+        sort: Optional[List[Tuple[str, int]]]
+            Which items to claim first
+        projection: Optional[Dict[str, Any]]
+            The fields to return for each claimed item
+
+        Returns
+        -------
+        List[Union[Dict[str, Any], Type[T]]]
+            The items claimed by this call
+        """
+        self.__ensure_dict(filter_dict)
+        await self.__flush_writes()
+
+        now = datetime.datetime.utcnow()
+        unleased = {
+            "$or": [
+                {"lease_until": {"$exists": False}},
+                {"lease_until": {"$lte": now}},
+            ]
+        }
+        self.__record_query({"$and": [filter_dict, unleased]}, sort)
+        candidates = await self._document.find(
+            {"$and": [filter_dict, unleased]}, {"_id": 1}, sort=sort, limit=limit
+        ).to_list(None)
+        if not candidates:
+            return []
+
+        token = uuid.uuid4().hex
+        lease_fields = {
+            "lease_owner": owner,
+            "lease_token": token,
+            "lease_until": now + datetime.timedelta(seconds=lease),
+        }
+        await self._document.update_many(
+            {"$and": [{"_id": {"$in": [c["_id"] for c in candidates]}}, unleased]},
+            {"$set": lease_fields, "$inc": {"attempts": 1}},
+        )
+        # Read attempts back too, events carry its new value
+        read_projection = projection
+        hide_attempts = False
+        if projection:
+            inclusive = any(v for k, v in projection.items() if k != "_id")
+            if not projection.get("attempts", not inclusive):
+                hide_attempts = True
+                read_projection = {
+                    k: v for k, v in projection.items() if k != "attempts"
+                }
+                if inclusive:
+                    read_projection["attempts"] = 1
+
+        self.__record_query({"lease_token": token}, sort)
+        claimed = await self._document.find(
+            {"lease_token": token}, read_projection, sort=sort
+        ).to_list(None)
+
+        by_attempts: Dict[Any, List[Any]] = {}
+        for item in claimed:
+            attempts = item.pop("attempts") if hide_attempts else item["attempts"]
+            by_attempts.setdefault(attempts, []).append(item["_id"])
+        for attempts, ids in by_attempts.items():
+            self.events.publish(
+                UpdateEvent(
+                    self.document_name,
+                    ids,
+                    fields={**lease_fields, "attempts": attempts},
+                )
+            )
+        return claimed
+
+    @timed
     async def delete_by_id(self, data_id: Any) -> Optional[DeleteResult]:
         """
         Delete an item from the Document
@@ -286,6 +1102,7 @@ class Document:
         """
         return await self.delete_by_custom({"_id": data_id})
 
+    @timed
     async def delete_by_custom(
         self, filter_dict: Dict[str, Any]
     ) -> Optional[DeleteResult]:
@@ -302,15 +1119,69 @@ class Document:
         Returns
         -------
         DeleteResult
-            The result of deletion
+            The result of deletion, ``None`` if nothing was deleted.
+            Deletes aren't buffered so this is always known
         """
         self.__ensure_dict(filter_dict)
-
+        await self.__flush_writes()
         result: DeleteResult = await self._document.delete_many(filter_dict)
         result: Optional[DeleteResult] = result if result.deleted_count != 0 else None
+        if result is not None:
+            self.events.publish(
+                DeleteEvent(
+                    self.document_name, ids_from_filter(filter_dict), filter_dict
+                )
+            )
         return result
 
-    async def insert(self, data: Dict[str, Any]) -> None:
+    @timed
+    async def delete_many(
+        self, items: List[Union[Dict, Any]], chunk_size: int = BULK_CHUNK_SIZE
+    ) -> int:
+        """
+        Delete many items by _id using one
+        ``$in`` delete per chunk of ids.
+
+        Parameters
+        ----------
+        items: List[Union[Dict, Any]]
+            The _id's of the items to delete,
+            or the items themselves
+        chunk_size: int
+            How many _id's to send in a single delete
+
+        Returns
+        -------
+        int
+            How many items were deleted
+        """
+        ids = [item["_id"] if isinstance(item, dict) else item for item in items]
+        await self.__flush_writes()
+
+        deleted, gone = 0, []
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start : start + chunk_size]
+            result: DeleteResult = await self._document.delete_many(
+                {"_id": {"$in": chunk}}
+            )
+            deleted += result.deleted_count
+            if result.deleted_count < len(chunk):
+                # Only report the items that are really gone
+                left = {
+                    d["_id"]
+                    async for d in self._document.find(
+                        {"_id": {"$in": chunk}}, {"_id": 1}
+                    )
+                }
+                chunk = [_id for _id in chunk if _id not in left]
+            gone.extend(chunk)
+
+        if deleted:
+            self.events.publish(DeleteEvent(self.document_name, gone))
+        return deleted
+
+    @timed
+    async def insert(self, data: Dict[str, Any], buffered: bool = True) -> None:
         """
         Insert the given data into the _document
 
@@ -318,11 +1189,24 @@ class Document:
         ----------
         data: Dict[str, Any]
             The data to insert
+        buffered: bool
+            Queue the insert when writes are buffered, pass
+            ``False`` to send it straight away and have it
+            raise if it is rejected
         """
         self.__ensure_dict(data)
+        if self.write_buffer is not None:
+            if buffered:
+                self.write_buffer.insert(data)
+                return
+            if data.get("_id") in self.write_buffer:
+                # Keep the writes to this _id in order
+                await self.__flush_writes()
 
         await self._document.insert_one(data)
+        self.events.publish(InsertEvent(self.document_name, [data]))
 
+    @timed
     async def upsert(
         self,
         filter_dict: Union[Dict, Any],
@@ -361,6 +1245,7 @@ class Document:
 
         await self.upsert_custom(filter_dict, data, option, *args, **kwargs)
 
+    @timed
     async def update_by_id(
         self, data: Dict[str, Any], option: str = "set", *args: Any, **kwargs: Any
     ) -> None:
@@ -385,10 +1270,9 @@ class Document:
         self.__ensure_id(data)
 
         data_id = data.pop("_id")
-        await self._document.update_one(
-            {"_id": data_id}, {f"${option}": data}, *args, **kwargs
-        )
+        await self.__update_one({"_id": data_id}, {f"${option}": data}, *args, **kwargs)
 
+    @timed
     async def upsert_custom(
         self,
         filter_dict: Dict[str, Any],
@@ -417,6 +1301,7 @@ class Document:
             filter_dict, update_data, option, upsert=True, *args, **kwargs
         )
 
+    @timed
     async def update_by_custom(
         self,
         filter_dict: Dict[str, Any],
@@ -442,10 +1327,11 @@ class Document:
         self.__ensure_dict(update_data)
 
         # Update
-        await self._document.update_one(
+        await self.__update_one(
             filter_dict, {f"${option}": update_data}, *args, **kwargs
         )
 
+    @timed
     async def unset(self, _id: Union[Dict, Any], field: Any) -> None:
         """
         Remove a given param, basically dict.pop on the db.
@@ -462,6 +1348,7 @@ class Document:
         filter_dict = self.__convert_filter(_id)
         await self.unset_by_custom(filter_dict, field)
 
+    @timed
     async def unset_by_custom(self, filter_dict: Dict[str, Any], field: Any) -> None:
         """
         Remove a given param, basically dict.pop on the db.
@@ -475,8 +1362,9 @@ class Document:
             The field to remove
         """
         self.__ensure_dict(filter_dict)
-        await self._document.update_one(filter_dict, {"$unset": {field: True}})
+        await self.__update_one(filter_dict, {"$unset": {field: True}})
 
+    @timed
     async def increment(
         self, data_id: Union[Dict, Any], amount: Union[int, float], field: str
     ) -> None:
@@ -496,6 +1384,7 @@ class Document:
 
         await self.increment_by_custom(filter_dict, amount, field)
 
+    @timed
     async def increment_by_custom(
         self, filter_dict: Dict[Any, Any], amount: Union[int, float], field: str
     ) -> None:
@@ -512,8 +1401,9 @@ class Document:
             The key for the field to increment
         """
         self.__ensure_dict(filter_dict)
-        await self._document.update_one(filter_dict, {"$inc": {field: amount}})
+        await self.__update_one(filter_dict, {"$inc": {field: amount}})
 
+    @timed
     async def update_field_to(
         self, filter_dict: Union[Dict[Any, Any], Any], field: str, new_value: Any
     ) -> None:
@@ -531,22 +1421,216 @@ class Document:
         """
         filter_dict = self.__convert_filter(filter_dict)
         self.__ensure_dict(filter_dict)
-        await self._document.update_one(filter_dict, {"$set": {field: new_value}})
+        await self.__update_one(filter_dict, {"$set": {field: new_value}})
+
+    @timed
+    async def create_index(
+        self, keys: Union[str, List[Tuple[str, int]]], **kwargs: Any
+    ) -> str:
+        """
+        Ensure an index exists on this _document,
+        creating it if it is missing.
+
+        Parameters
+        ----------
+        keys: Union[str, List[Tuple[str, int]]]
+            A single key or a list of (key, direction) pairs
+        kwargs: Any
+            Extra index options such as ``name`` or ``unique``
+
+        Returns
+        -------
+        str
+            The name of the index
+        """
+        return await self._document.create_index(keys, **kwargs)
 
-    async def bulk_insert(self, data: List[Dict]) -> None:
+    @timed
+    async def ensure_indexes(self) -> List[str]:
+        """
+        Create the declared indexes that don't exist yet.
+
+        Returns
+        -------
+        List[str]
+            The names of the declared indexes
+        """
+        if not self.indexes:
+            return []
+        return await self._document.create_indexes(self.indexes)
+
+    @timed
+    async def explain(
+        self, filter_dict: Dict[str, Any], sort: Optional[List[Tuple[str, int]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ask the server how it would run a query.
+
+        Parameters
+        ----------
+        filter_dict: Dict[str, Any]
+            The query's filter
+        sort: Optional[List[Tuple[str, int]]]
+            The query's sort
+
+        Returns
+        -------
+        Dict[str, Any]
+            The server's explain output
+        """
+        cursor = self._document.find(filter_dict)
+        if sort:
+            cursor = cursor.sort(sort)
+        return await cursor.explain()
+
+    @timed
+    async def bulk_insert(
+        self,
+        data: List[Dict],
+        ordered: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> BulkResult:
         """
         Given a List of Dictionaries, bulk insert all of
-        the given dictionaries in a single call.
+        the given dictionaries, a chunk per call.
 
         Parameters
         ----------
         data: List[Dict]
-            The data to bulk insert
+            The data to bulk insert, items
+            without an _id are given one
+        ordered: bool
+            Stop at the first failed insert instead
+            of carrying on with the rest
+        chunk_size: int
+            How many inserts to send in a single round trip
+
+        Returns
+        -------
+        BulkResult
+            The combined counts and any per item errors,
+            such as a duplicate _id
         """
         self.__ensure_list_of_dicts(data)
-        await self._document.insert_many(data)
+        for d in data:
+            if "_id" not in d:
+                d["_id"] = ObjectId()
+        await self.__flush_writes()
+
+        def published(indexes: List[int]) -> None:
+            if indexes:
+                self.events.publish(
+                    InsertEvent(self.document_name, [data[i] for i in indexes])
+                )
+
+        return await self.__bulk_write(
+            [InsertOne(d) for d in data], ordered, chunk_size, published
+        )
 
     # <-- Private methods -->
+    async def __bulk_update(
+        self,
+        data: List[Dict],
+        option: str,
+        upsert: bool,
+        ordered: bool,
+        chunk_size: int,
+    ) -> BulkResult:
+        self.__ensure_list_of_dicts(data)
+        updates = []
+        for d in data:
+            self.__ensure_id(d)
+            fields = {key: value for key, value in d.items() if key != "_id"}
+            updates.append(({"_id": d["_id"]}, {f"${option}": fields}))
+        await self.__flush_writes()
+
+        def published(indexes: List[int]) -> None:
+            for index in indexes:
+                self.__publish_update(*updates[index], upsert)
+
+        return await self.__bulk_write(
+            [UpdateOne(f, u, upsert=upsert) for f, u in updates],
+            ordered,
+            chunk_size,
+            published,
+        )
+
+    async def __bulk_write(
+        self,
+        requests: List[Any],
+        ordered: bool,
+        chunk_size: int,
+        published: Callable[[List[int]], None],
+    ) -> BulkResult:
+        """
+        Send `requests` a chunk at a time, calling `published`
+        with the indexes of the writes that landed after each chunk.
+        """
+        result = BulkResult()
+        for start in range(0, len(requests), chunk_size):
+            chunk = requests[start : start + chunk_size]
+            failed: Set[int] = set()
+            try:
+                written = await self._document.bulk_write(chunk, ordered=ordered)
+            except BulkWriteError as e:
+                result.add_error(e.details, start)
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            else:
+                result.add(written, start)
+
+            # An ordered write stops at its first failure
+            sent = min(failed) + 1 if ordered and failed else len(chunk)
+            published([start + i for i in range(sent) if i not in failed])
+            if ordered and failed:
+                break
+        return result
+
+    async def __update_one(
+        self, filter_dict: Dict[str, Any], update: Dict[str, Dict], *args, **kwargs
+    ) -> None:
+        upsert = kwargs.get("upsert", False)
+        _id = self.__buffered_id(filter_dict)
+        if _id is not _MISSING and not args and set(kwargs) <= {"upsert"}:
+            self.write_buffer.update(_id, update, upsert)
+            return
+
+        await self.__flush_writes()
+        await self._document.update_one(filter_dict, update, *args, **kwargs)
+        self.__publish_update(filter_dict, update, upsert)
+
+    def __record_query(
+        self, filter_dict: Dict[str, Any], sort: Optional[List] = None
+    ) -> None:
+        # Keep the latest example of each query shape so
+        # explain can be run on what this Document really issues
+        shape = (_shape(filter_dict), tuple(map(tuple, sort or ())))
+        if shape in self.queries or len(self.queries) < MAX_RECORDED_QUERIES:
+            self.queries[shape] = (filter_dict, sort)
+
+    def __buffered_id(self, filter_dict: Optional[Dict[str, Any]]) -> Any:
+        """The _id to queue a write under, if the write buffer can take it."""
+        if self.write_buffer is None or not filter_dict or set(filter_dict) != {"_id"}:
+            return _MISSING
+        _id = filter_dict["_id"]
+        return _MISSING if isinstance(_id, dict) else _id
+
+    async def __flush_writes(self) -> None:
+        # Rejected writes have nothing to do with
+        # the caller, so they are only logged here
+        if self.write_buffer is None:
+            return
+        try:
+            await self.write_buffer.flush()
+        except BulkWriteError:
+            log.exception("Buffered writes to %s failed", self.document_name)
+
+    def __publish_update(
+        self, filter_dict: Dict[str, Any], update: Dict[str, Dict], upsert=False
+    ) -> None:
+        self.events.publish(
+            UpdateEvent.from_update(self.document_name, filter_dict, update, upsert)
+        )
+
     @staticmethod
     def __ensure_list_of_dicts(data: List[Dict]):
         assert isinstance(data, list)
@@ -0,0 +1,223 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+import discord
+
+from utils.cache import TTLCache
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` acquisitions every ``per`` seconds,
+    refilling continuously. Waiters are served in order.
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._acquirers = 0
+
+    @property
+    def full(self) -> bool:
+        elapsed = time.monotonic() - self._updated
+        return self._tokens + elapsed * self.rate / self.per >= self.rate
+
+    @property
+    def idle(self) -> bool:
+        """Whether the bucket is full and nobody is waiting on it."""
+        return not self._acquirers and self.full
+
+    async def acquire(self) -> None:
+        self._acquirers += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(
+                        self.rate,
+                        self._tokens + (now - self._updated) * self.rate / self.per,
+                    )
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+        finally:
+            self._acquirers -= 1
+
+
+class DeliveryResult:
+    __slots__ = ("job", "error")
+
+    def __init__(self, job: Any, error: Optional[BaseException] = None):
+        self.job = job
+        self.error = error
+
+    @property
+    def delivered(self) -> bool:
+        return self.error is None
+
+
+class DeliveryPool:
+    """
+    Runs deliveries with bounded concurrency while pacing
+    REST calls against Discord's global and per-route limits.
+
+    Deliveries call :meth:`acquire` before each request they make,
+    passing the route key (e.g. a DM channel id) when the request
+    falls under a per-route bucket.
+
+    Parameters
+    ----------
+    concurrency: int
+        How many deliveries may run at once
+    global_rate: int
+        Requests allowed per second across the whole bot
+    route_rate: int
+        Requests allowed per ``route_per`` seconds on a single route
+    route_per: float
+        The window of a per-route bucket in seconds
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        global_rate: int = 50,
+        route_rate: int = 5,
+        route_per: float = 5.0,
+    ):
+        self.concurrency = concurrency
+        self.route_rate = route_rate
+        self.route_per = route_per
+        self._global = TokenBucket(global_rate, 1.0)
+        self._routes: Dict[Hashable, TokenBucket] = {}
+
+    async def acquire(self, route: Optional[Hashable] = None) -> None:
+        """
+        Wait until one more request may be made.
+
+        Parameters
+        ----------
+        route: Optional[Hashable]
+            The per-route bucket the request falls under, if any
+        """
+        if route is not None:
+            bucket = self._routes.get(route)
+            if bucket is None:
+                bucket = self._routes[route] = TokenBucket(
+                    self.route_rate, self.route_per
+                )
+            await bucket.acquire()
+        await self._global.acquire()
+
+    async def run(
+        self,
+        jobs: Iterable[Any],
+        send: Callable[[Any], Awaitable[None]],
+        concurrency: Optional[int] = None,
+    ) -> List[DeliveryResult]:
+        """
+        Deliver every job, at most ``concurrency`` at a time.
+
+        Parameters
+        ----------
+        jobs: Iterable[Any]
+            The jobs to deliver
+        send: Callable[[Any], Awaitable[None]]
+            Delivers a single job, raising if it failed
+        concurrency: Optional[int]
+            Overrides the pool's concurrency for these jobs,
+            a lower value leaves more of the rate limit to other runs
+
+        Returns
+        -------
+        List[DeliveryResult]
+            One result per job, in completion order
+        """
+        jobs = list(jobs)
+        pending = iter(jobs)
+        results: List[DeliveryResult] = []
+
+        async def worker():
+            for job in pending:
+                try:
+                    await send(job)
+                except Exception as error:
+                    results.append(DeliveryResult(job, error))
+                else:
+                    results.append(DeliveryResult(job))
+
+        await asyncio.gather(
+            *(worker() for _ in range(min(concurrency or self.concurrency, len(jobs))))
+        )
+        self._prune_routes()
+        return results
+
+    def _prune_routes(self) -> None:
+        # Runs share the buckets, so one still waiting on a route must
+        # keep its bucket or a fresh one would let the route burst
+        for route in [route for route, bucket in self._routes.items() if bucket.idle]:
+            del self._routes[route]
+
+
+class DMChannelCache:
+    """
+    Remembers the DM channel id of each user so sending
+    them a message is a single request.
+
+    Channels are opened without fetching the user first,
+    and every request is paced through the delivery pool.
+
+    Parameters
+    ----------
+    bot: discord.Client
+        The bot to open channels with
+    pool: DeliveryPool
+        The pool to pace requests through
+    maxsize: int
+        The most channel ids to remember
+    ttl: Optional[float]
+        Seconds to remember a channel id for
+    """
+
+    def __init__(
+        self,
+        bot: discord.Client,
+        pool: DeliveryPool,
+        maxsize: int = 50_000,
+        ttl: Optional[float] = 86400,
+    ):
+        self.bot = bot
+        self.pool = pool
+        self._channels = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._channels
+
+    async def open(self, user_id: int) -> int:
+        """Open (or look up) the DM channel with a user and remember its id."""
+        channel_id = self._channels.get(user_id)
+        if channel_id is None:
+            await self.pool.acquire()
+            channel = await self.bot.create_dm(discord.Object(id=user_id))
+            channel_id = channel.id
+            self._channels.set(user_id, channel_id)
+        return channel_id
+
+    async def get_channel(self, user_id: int) -> discord.PartialMessageable:
+        channel_id = await self.open(user_id)
+        return self.bot.get_partial_messageable(
+            channel_id, type=discord.ChannelType.private
+        )
+
+    async def prefetch(self, user_ids: Iterable[int]) -> List[DeliveryResult]:
+        """Open DM channels for the users that don't have one cached yet."""
+        missing = {user_id for user_id in user_ids if user_id not in self._channels}
+        return await self.pool.run(missing, self.open)
+
+    def invalidate(self, user_id: int) -> None:
+        self._channels.pop(user_id)
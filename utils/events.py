@@ -0,0 +1,271 @@
+import asyncio
+import inspect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Type
+
+log = logging.getLogger(__name__)
+
+__all__ = [
+    "DocumentEvent",
+    "InsertEvent",
+    "UpdateEvent",
+    "DeleteEvent",
+    "EventBus",
+    "ChangeStreamListener",
+]
+
+
+class DocumentEvent:
+    """
+    Base class for a write made to a Document.
+
+    Attributes
+    ----------
+    document_name: str
+        The collection that was written to
+    ids: Optional[List[Any]]
+        The _id's affected, or ``None`` when the write was made
+        through a filter that doesn't pin down the _id's
+    filter: Optional[Dict[str, Any]]
+        The filter the write was made with, if any
+    source: str
+        ``"local"`` for writes made by this process,
+        ``"change_stream"`` for writes seen through a change stream
+    """
+
+    __slots__ = ("document_name", "ids", "filter", "source")
+
+    def __init__(
+        self,
+        document_name: str,
+        ids: Optional[List[Any]] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        source: str = "local",
+    ):
+        self.document_name = document_name
+        self.ids = ids
+        self.filter = filter
+        self.source = source
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__}(document_name={self.document_name}, "
+            f"ids={self.ids}, source={self.source})>"
+        )
+
+
+class InsertEvent(DocumentEvent):
+    """
+    Items were inserted. ``documents`` holds the inserted items.
+    """
+
+    __slots__ = ("documents",)
+
+    def __init__(self, document_name: str, documents: List[Dict[str, Any]], **kwargs):
+        super().__init__(document_name, [d.get("_id") for d in documents], **kwargs)
+        self.documents = documents
+
+
+class UpdateEvent(DocumentEvent):
+    """
+    Items were updated.
+
+    ``fields`` maps each changed field to its new value
+    (or to the increment for ``$inc``), ``removed`` lists unset
+    fields and ``upsert`` is whether the write could insert.
+    """
+
+    __slots__ = ("fields", "removed", "upsert")
+
+    def __init__(
+        self,
+        document_name: str,
+        ids: Optional[List[Any]] = None,
+        fields: Optional[Dict[str, Any]] = None,
+        removed: Optional[List[str]] = None,
+        upsert: bool = False,
+        **kwargs,
+    ):
+        super().__init__(document_name, ids, **kwargs)
+        self.fields = fields or {}
+        self.removed = removed or []
+        self.upsert = upsert
+
+    @classmethod
+    def from_update(
+        cls,
+        document_name: str,
+        filter_dict: Dict[str, Any],
+        update: Dict[str, Dict[str, Any]],
+        upsert: bool = False,
+        **kwargs,
+    ) -> "UpdateEvent":
+        """Describe an update made with Mongo update operators."""
+        fields, removed = {}, []
+        for operator, values in update.items():
+            if operator == "$unset":
+                removed.extend(values)
+            else:
+                fields.update(values)
+
+        return cls(
+            document_name,
+            ids_from_filter(filter_dict),
+            fields=fields,
+            removed=removed,
+            upsert=upsert,
+            filter=filter_dict,
+            **kwargs,
+        )
+
+
+class DeleteEvent(DocumentEvent):
+    """
+    Items were deleted.
+    """
+
+    __slots__ = ()
+
+
+def ids_from_filter(filter_dict: Dict[str, Any]) -> Optional[List[Any]]:
+    """The _id's a filter is restricted to, if it names them directly."""
+    if "_id" not in filter_dict:
+        return None
+
+    value = filter_dict["_id"]
+    if not isinstance(value, dict):
+        return [value]
+    if set(value) == {"$in"}:
+        return list(value["$in"])
+    return None
+
+
+class EventBus:
+    """
+    Delivers events to subscribed callbacks.
+
+    Callbacks run in the order they subscribed. A callback that
+    returns a coroutine has it scheduled as a task, and errors
+    raised by callbacks are logged rather than raised to the writer.
+    """
+
+    def __init__(self):
+        self._subscribers: List[tuple] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    def subscribe(
+        self,
+        callback: Callable[[DocumentEvent], Any],
+        *event_types: Type[DocumentEvent],
+    ) -> None:
+        """
+        Parameters
+        ----------
+        callback: Callable[[DocumentEvent], Any]
+            Called with every matching event
+        event_types: Type[DocumentEvent]
+            Only deliver these event types, defaults to all of them
+        """
+        self._subscribers.append((callback, event_types or (DocumentEvent,)))
+
+    def unsubscribe(self, callback: Callable[[DocumentEvent], Any]) -> None:
+        self._subscribers = [s for s in self._subscribers if s[0] != callback]
+
+    def publish(self, event: DocumentEvent) -> None:
+        for callback, event_types in self._subscribers:
+            if not isinstance(event, event_types):
+                continue
+            try:
+                result = callback(event)
+            except Exception:
+                log.exception("Error in %r while handling %r", callback, event)
+                continue
+
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Error in event subscriber", exc_info=task.exception())
+
+
+class ChangeStreamListener:
+    """
+    Feeds a Document's event bus from a MongoDB change stream,
+    so writes made by other processes reach local subscribers.
+
+    Change streams need a replica set or sharded cluster.
+    Events published from here have ``source="change_stream"``;
+    this process's own writes are seen twice, once from each
+    source, so subscribers should be idempotent.
+
+    Parameters
+    ----------
+    document: Document
+        The Document to watch and publish on
+    retry_delay: float
+        Seconds to wait before resuming after the stream errors
+    """
+
+    def __init__(self, document, retry_delay: float = 5.0):
+        self.document = document
+        self.retry_delay = retry_delay
+        self._resume_token = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.document.raw_collection.watch(
+                    resume_after=self._resume_token
+                ) as stream:
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        event = self._to_event(change)
+                        if event is not None:
+                            self.document.events.publish(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception(
+                    "Change stream on %s failed, resuming in %ss",
+                    self.document.document_name,
+                    self.retry_delay,
+                )
+                await asyncio.sleep(self.retry_delay)
+
+    def _to_event(self, change: Dict[str, Any]) -> Optional[DocumentEvent]:
+        name = self.document.document_name
+        operation = change["operationType"]
+        ids = [change["documentKey"]["_id"]] if "documentKey" in change else None
+
+        if operation == "insert":
+            return InsertEvent(name, [change["fullDocument"]], source="change_stream")
+        if operation == "replace":
+            return UpdateEvent(
+                name, ids, fields=change["fullDocument"], source="change_stream"
+            )
+        if operation == "update":
+            description = change["updateDescription"]
+            return UpdateEvent(
+                name,
+                ids,
+                fields=description.get("updatedFields"),
+                removed=description.get("removedFields"),
+                source="change_stream",
+            )
+        if operation == "delete":
+            return DeleteEvent(name, ids, source="change_stream")
+        return None
@@ -0,0 +1,125 @@
+import datetime
+import time
+from typing import Optional
+
+__all__ = [
+    "SnowflakeGenerator",
+    "encode_id",
+    "decode_id",
+    "created_at",
+    "snowflake_at",
+]
+
+# Milliseconds since the Unix epoch our ids count from
+EPOCH = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+TIMESTAMP_SHIFT = WORKER_BITS + SEQUENCE_BITS
+# Ids are stored as BSON's signed 64 bit ints
+MAX_ID = (1 << 63) - 1
+MAX_CODE_LENGTH = 13
+
+# Crockford's base 32, no I, L, O or U so codes can't be misread
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+_DECODE.update({"I": 1, "L": 1, "O": 0})
+
+
+class SnowflakeGenerator:
+    """
+    Makes unique, time ordered 63 bit ids.
+
+    Each id is the milliseconds since :data:`EPOCH`, then a
+    10 bit worker number, then a 12 bit sequence within the
+    millisecond. Processes with different worker numbers
+    never make the same id, and ids from one process only
+    ever grow, even if the clock steps back.
+
+    Parameters
+    ----------
+    worker: int
+        This process' worker number, 0 to 1023. No two
+        running processes may share one, or they can make
+        the same ids.
+
+    Raises
+    ------
+    ValueError
+        `worker` is not a worker number
+    """
+
+    def __init__(self, worker: int):
+        if (
+            not isinstance(worker, int)
+            or isinstance(worker, bool)
+            or not 0 <= worker <= MAX_WORKER
+        ):
+            raise ValueError(f"Worker must be 0 to {MAX_WORKER}, not {worker!r}")
+        self.worker = worker
+        self._last = 0
+        self._sequence = 0
+
+    def __repr__(self):
+        return f"<SnowflakeGenerator(worker={self.worker})>"
+
+    def next(self) -> int:
+        now = max(int(time.time() * 1000) - EPOCH, self._last)
+        if now == self._last:
+            self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+            if self._sequence == 0:
+                # Out of ids for this millisecond, borrow the next
+                now += 1
+        else:
+            self._sequence = 0
+        self._last = now
+        return now << TIMESTAMP_SHIFT | self.worker << SEQUENCE_BITS | self._sequence
+
+
+def encode_id(snowflake: int) -> str:
+    """The short code users see for an id, e.g. ``"A8N4SPG1PMH2"``."""
+    if snowflake < 0:
+        raise ValueError("Ids can't be negative")
+    code = []
+    while True:
+        snowflake, digit = divmod(snowflake, 32)
+        code.append(ALPHABET[digit])
+        if not snowflake:
+            return "".join(reversed(code))
+
+
+def decode_id(code: str) -> Optional[int]:
+    """
+    The id a code stands for, ``None`` if it isn't one.
+    Case, dashes and the look-alikes I, L and O are forgiven.
+    """
+    code = code.strip().upper().replace("-", "")
+    if not code or len(code) > MAX_CODE_LENGTH:
+        return None
+
+    snowflake = 0
+    for char in code:
+        if char not in _DECODE:
+            return None
+        snowflake = snowflake * 32 + _DECODE[char]
+    return snowflake if snowflake <= MAX_ID else None
+
+
+def created_at(snowflake: int) -> datetime.datetime:
+    """When an id was made, as a naive UTC datetime."""
+    milliseconds = (snowflake >> TIMESTAMP_SHIFT) + EPOCH
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(
+        milliseconds=milliseconds
+    )
+
+
+def snowflake_at(when: datetime.datetime) -> int:
+    """
+    The smallest id made at or after `when`, a naive UTC
+    datetime, for scanning ``_id`` ranges by creation time.
+    """
+    milliseconds = (when - datetime.datetime(1970, 1, 1)) // datetime.timedelta(
+        milliseconds=1
+    )
+    return max(milliseconds - EPOCH, 0) << TIMESTAMP_SHIFT
@@ -0,0 +1,117 @@
+import bisect
+from typing import Dict, Optional, Sequence
+
+__all__ = ["Histogram", "Metrics", "OperationStats"]
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 3600
+)
+# Database calls are mostly well under DEFAULT_BUCKETS' first bound
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets, so memory
+    stays constant however many values are observed.
+
+    Parameters
+    ----------
+    buckets: Sequence[float]
+        Ascending upper bounds, values above the last
+        bound fall into an overflow bucket
+    """
+
+    __slots__ = ("buckets", "counts", "count", "total", "min", "max")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        The bucket bound at or below which `percent`
+        of observations fall, capped at the largest value seen.
+        """
+        if not self.count:
+            return None
+
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if index == len(self.buckets):
+                    return self.max
+                return min(self.buckets[index], self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    A named set of counters and histograms.
+    Histograms are created on their first observation.
+    """
+
+    def __init__(self, buckets: Optional[Dict[str, Sequence[float]]] = None):
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._buckets = buckets or {}
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(
+                self._buckets.get(name, DEFAULT_BUCKETS)
+            )
+        histogram.observe(value)
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+
+
+class OperationStats:
+    """
+    Calls, failures, slow calls and items
+    handled by one kind of database operation,
+    with a histogram of how long it took.
+    """
+
+    __slots__ = ("calls", "errors", "slow", "items", "latency")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+        self.items = 0
+        self.latency = Histogram(buckets)
+
+    def observe(
+        self, seconds: float, items: int, failed: bool = False, slow: bool = False
+    ) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.slow += slow
+        self.items += items
+        self.latency.observe(seconds)
@@ -0,0 +1,74 @@
+import datetime
+from typing import Any, Dict, Optional
+
+from utils.ids import encode_id
+
+__all__ = ["Reminder"]
+
+
+class Reminder:
+    """
+    A reminder as stored in the ``reminders`` collection.
+
+    Fields left out by a projection are ``None``,
+    except ``attempts`` which defaults to ``0``.
+    """
+
+    __slots__ = (
+        "id",
+        "time",
+        "user",
+        "message",
+        "url",
+        "attempts",
+        "lease_owner",
+        "lease_token",
+        "lease_until",
+    )
+
+    def __init__(
+        self,
+        _id: Any = None,
+        time: Optional[datetime.datetime] = None,
+        user: Optional[int] = None,
+        message: Optional[str] = None,
+        url: Optional[str] = None,
+        attempts: int = 0,
+        lease_owner: Optional[str] = None,
+        lease_token: Optional[str] = None,
+        lease_until: Optional[datetime.datetime] = None,
+    ):
+        self.id = _id
+        self.time = time
+        self.user = user
+        self.message = message
+        self.url = url
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+        self.lease_token = lease_token
+        self.lease_until = lease_until
+
+    def __repr__(self):
+        return f"<Reminder(id={self.id}, user={self.user}, time={self.time})>"
+
+    @property
+    def code(self) -> str:
+        """The short code users refer to this reminder by."""
+        return encode_id(self.id) if isinstance(self.id, int) else str(self.id)
+
+    def to_document(self) -> Dict[str, Any]:
+        """The document to store, leaving out unset lease fields."""
+        document = {
+            "_id": self.id,
+            "time": self.time,
+            "user": self.user,
+            "message": self.message,
+            "url": self.url,
+        }
+        if self.attempts:
+            document["attempts"] = self.attempts
+        if self.lease_token is not None:
+            document["lease_owner"] = self.lease_owner
+            document["lease_token"] = self.lease_token
+            document["lease_until"] = self.lease_until
+        return document
@@ -0,0 +1,109 @@
+from typing import List, Optional
+
+import discord
+
+from utils.models import Reminder
+
+__all__ = ["PackedMessage", "pack_reminders"]
+
+# Discord's message limits
+MAX_EMBEDS = 10
+MAX_FIELDS = 25
+MAX_EMBED_CHARACTERS = 6000
+MAX_FIELD_VALUE = 1024
+MAX_BUTTONS = 25
+
+TITLE = "Reminders"
+
+
+class PackedMessage:
+    """
+    One message's worth of reminders.
+
+    Attributes
+    ----------
+    embeds: List[discord.Embed]
+        Between one and ten embeds
+    view: discord.ui.View
+        Jump buttons for the reminders that have a url
+    reminders: List[Reminder]
+        The reminders shown in this message
+    """
+
+    __slots__ = ("embeds", "view", "reminders", "characters")
+
+    def __init__(self):
+        self.embeds: List[discord.Embed] = []
+        self.view = discord.ui.View()
+        self.reminders: List[Reminder] = []
+        self.characters = 0
+
+
+def pack_reminders(
+    reminders: List[Reminder], color: int, emoji: Optional[str] = None
+) -> List[PackedMessage]:
+    """
+    Lay out a user's reminders over as few messages as possible.
+
+    Each reminder becomes an embed field and, if it has a url,
+    a jump button. Fields fill an embed up to 25, embeds fill a
+    message up to 10 and the 6000 character total, and buttons
+    fill a message up to 25 before a new one is started.
+
+    Parameters
+    ----------
+    reminders: List[Reminder]
+        The reminders to lay out, in the order to show them
+    color: int
+        The embed color
+    emoji: Optional[str]
+        The emoji on jump buttons
+
+    Returns
+    -------
+    List[PackedMessage]
+        The messages to send, in order
+    """
+    messages: List[PackedMessage] = []
+    message: Optional[PackedMessage] = None
+
+    for reminder in reminders:
+        name = f"Reminder ID: {reminder.code}"
+        value = f"Message: {reminder.message}"
+        if len(value) > MAX_FIELD_VALUE:
+            value = value[: MAX_FIELD_VALUE - 1] + "…"
+        size = len(name) + len(value)
+        url = reminder.url
+
+        if message is not None:
+            embed = message.embeds[-1]
+            fits_embed = len(embed.fields) < MAX_FIELDS
+            fits_message = fits_embed or len(message.embeds) < MAX_EMBEDS
+            fits_message &= message.characters + size <= MAX_EMBED_CHARACTERS
+            if url:
+                fits_message &= len(message.view.children) < MAX_BUTTONS
+            if not fits_message:
+                message = None
+
+        if message is None:
+            message = PackedMessage()
+            message.embeds.append(discord.Embed(title=TITLE, color=color))
+            message.characters = len(TITLE)
+            messages.append(message)
+        elif len(message.embeds[-1].fields) >= MAX_FIELDS:
+            message.embeds.append(discord.Embed(color=color))
+
+        message.embeds[-1].add_field(name=name, value=value, inline=False)
+        message.characters += size
+        message.reminders.append(reminder)
+        if url:
+            message.view.add_item(
+                discord.ui.Button(
+                    style=discord.ButtonStyle.url,
+                    label=f"Rem. ID: {reminder.code}",
+                    url=url,
+                    emoji=emoji,
+                )
+            )
+
+    return messages
@@ -0,0 +1,136 @@
+import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import discord
+
+from utils.ids import decode_id, encode_id
+from utils.models import Reminder
+from utils.paginator import PageSource
+
+if TYPE_CHECKING:
+    from utils.db import Document
+
+__all__ = ["ReminderPages"]
+
+LIST_SORT = [("time", 1), ("_id", 1)]
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MILLISECOND = datetime.timedelta(milliseconds=1)
+
+
+class ReminderPages(PageSource):
+    """
+    A user's reminders in time order, one embed per page,
+    fetched from the database only when a page is shown.
+
+    Each fetched page remembers the sort keys of its first and
+    last reminder, so moving to a neighbouring page is a keyset
+    query, and the last page is read backwards from the end.
+
+    Parameters
+    ----------
+    reminders: Document
+        The reminders collection
+    user_id: int
+        Whose reminders to list
+    total: int
+        How many reminders the user has
+    color: int
+        The embed color
+    per_page: int
+        How many reminders a page shows
+    projection: Optional[Dict[str, Any]]
+        The fields to fetch, ``time`` and ``message`` are shown
+    """
+
+    def __init__(
+        self,
+        reminders: "Document",
+        user_id: int,
+        total: int,
+        color: int,
+        per_page: int = 5,
+        projection: Optional[Dict[str, Any]] = None,
+    ):
+        super().__init__(count=max(1, -(-total // per_page)))
+        self.reminders = reminders
+        self.user_id = user_id
+        self.total = total
+        self.color = color
+        self.per_page = per_page
+        self.projection = projection
+        # The sort keys of the first and last reminder on each page fetched
+        self._starts: Dict[int, Tuple[Any, ...]] = {}
+        self._ends: Dict[int, Tuple[Any, ...]] = {}
+
+    @classmethod
+    def from_state(
+        cls, reminders: "Document", user_id: int, index: int, state: str, **kwargs
+    ) -> Optional["ReminderPages"]:
+        """
+        Pick up a list at page `index` from what :meth:`state`
+        returned for it, ``None`` if `state` is not one of ours.
+        """
+        parts = [decode_id(part) for part in state.split(".")]
+        if not parts or None in parts or len(parts) not in (1, 5):
+            return None
+
+        pages = cls(reminders, user_id, parts[0], **kwargs)
+        if len(parts) == 5:
+            start_time, start_id, end_time, end_id = parts[1:]
+            pages._starts[index] = (_EPOCH + start_time * _MILLISECOND, start_id)
+            pages._ends[index] = (_EPOCH + end_time * _MILLISECOND, end_id)
+        return pages
+
+    def state(self, index: int) -> str:
+        # The total, then the keyset bounds of the page if
+        # they fit, times in milliseconds like BSON stores them
+        parts = [self.total]
+        if index in self._starts and index in self._ends:
+            values = [
+                (b - _EPOCH) // _MILLISECOND if isinstance(b, datetime.datetime) else b
+                for b in (*self._starts[index], *self._ends[index])
+            ]
+            if all(isinstance(v, int) and v >= 0 for v in values):
+                parts.extend(values)
+        return ".".join(encode_id(part) for part in parts)
+
+    async def render(self, index: int) -> discord.Embed:
+        page = await self.fetch(index)
+        embed = discord.Embed(title="Reminders", color=self.color, description="")
+        for number, reminder in enumerate(page, index * self.per_page + 1):
+            timestamp = int(reminder.time.timestamp())
+            embed.description += (
+                f"{number}: {reminder.message}\n"
+                f"> <t:{timestamp}:R> (<t:{timestamp}:f>) \n"
+            )
+        embed.set_footer(text=f"Page {index + 1}/{self.count}")
+        return embed
+
+    async def fetch(self, index: int) -> List[Reminder]:
+        """The reminders on page `index`, counting from 0."""
+        kwargs: Dict[str, Any] = {}
+        if index == 0:
+            pass
+        elif index - 1 in self._ends:
+            kwargs["after"] = self._ends[index - 1]
+        elif index + 1 in self._starts:
+            kwargs["before"] = self._starts[index + 1]
+        elif index == self.count - 1:
+            kwargs["last"] = True
+        else:
+            kwargs["skip"] = index * self.per_page
+
+        limit = self.per_page
+        if kwargs.get("last"):
+            limit = self.total - index * self.per_page
+        page = await self.reminders.find_page(
+            {"user": self.user_id},
+            LIST_SORT,
+            limit,
+            projection=self.projection,
+            **kwargs,
+        )
+        if page:
+            self._starts[index] = (page[0].time, page[0].id)
+            self._ends[index] = (page[-1].time, page[-1].id)
+        return page
@@ -22,17 +22,117 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-__all__ = ["Paginator"]
+__all__ = [
+    "Paginator",
+    "PageSource",
+    "PageButton",
+    "PageSelect",
+    "register_source",
+    "unregister_source",
+]
+
+
+import re
+from discord import Embed, Interaction, SelectMenu, SelectOption, User, ButtonStyle
+from discord.ui import DynamicItem, View, Select, button, Button
+from typing import Any, Awaitable, Callable, Dict, Optional, List, Union
+from discord.ext import commands
 
+from utils.cache import TTLCache
+from utils.ids import decode_id, encode_id
 
-from discord import Interaction, SelectOption, User, ButtonStyle
-from discord.ui import View, Select, button, Button
-from typing import Optional, List, Union
-from discord.ext import commands
+PAGE_CACHE_SIZE = 8
+# Discord's limit on options in a select
+MAX_OPTIONS = 25
+
+# Builds the source behind a persistent paginator from its
+# owner, the page shown and the state that page left behind
+SourceFactory = Callable[[int, int, str], Awaitable[Optional["PageSource"]]]
+_sources: Dict[str, SourceFactory] = {}
+
+# Persistent buttons by the action letter in their custom_id,
+# custom_ids are capped at 100 characters
+_EMOJIS = {
+    "f": "<:tgk_backforward:1088526999288565833>",
+    "p": "<:tgk_leftarrow:1088526575781285929>",
+    "q": "<:tgk_stop:1088526796221317150>",
+    "n": "<:tgk_rightarrow:1088526714205917325>",
+    "l": "<:tgk_frontforward:1088526942422180003>",
+}
+
+
+class PageSource:
+    """Renders pages on demand, keeping the last few it rendered.
+
+    Either pass `render` or subclass and override :meth:`render`.
+
+    Parameters
+    -----------
+            'render' - An async callable taking a page index, counting from 0,
+                and returning the page, or None past the last page.
+            'count' - How many pages there are, None if not known up front.
+            'cache_size' - How many rendered pages to keep.
+    """
+
+    def __init__(
+        self,
+        render: Optional[Callable[[int], Awaitable[Any]]] = None,
+        count: Optional[int] = None,
+        cache_size: int = PAGE_CACHE_SIZE,
+    ):
+        self._render = render
+        self.count = count
+        # The furthest page known to exist
+        self.seen = -1
+        self._pages = TTLCache(maxsize=cache_size)
+
+    @classmethod
+    def from_list(cls, pages: list) -> "PageSource":
+        async def render(index: int):
+            return pages[index] if index < len(pages) else None
+
+        return cls(render, count=len(pages), cache_size=0)
+
+    async def render(self, index: int) -> Any:
+        return await self._render(index)
+
+    async def get_page(self, index: int) -> Any:
+        """The page at `index`, None if there is no such page."""
+        if index < 0 or (self.count is not None and index >= self.count):
+            return None
+
+        page = self._pages.get(index)
+        if page is None:
+            page = await self.render(index)
+            if page is None:
+                # Ran past the end of a source of unknown length
+                self.count = index if self.count is None else self.count
+                return None
+            self._pages.set(index, page)
+        self.seen = max(self.seen, index)
+        return page
+
+    def clear(self) -> None:
+        """Forget the rendered pages, e.g. after the data behind them changed."""
+        self._pages.clear()
+
+    def state(self, index: int) -> str:
+        """Short text ([A-Za-z0-9_.]) a persistent paginator keeps for page `index`.
+
+        It is handed back to the source factory on the next click, so
+        a source can resume without redoing work, e.g. keyset bounds.
+        """
+        return ""
+
+    def window(self, current: int, size: int = MAX_OPTIONS) -> range:
+        """The page indexes to offer around `current`, at most `size` of them."""
+        last = self.count - 1 if self.count is not None else self.seen + 1
+        start = max(0, min(current - size // 2, last - size + 1))
+        return range(start, min(last, start + size - 1) + 1)
 
 
 class _select(Select):
-    def __init__(self, pages: List[str]):
+    def __init__(self, pages: List[SelectOption]):
         super().__init__(
             placeholder="Quick navigation",
             min_values=1,
@@ -42,19 +142,18 @@ class _select(Select):
         )
 
     async def callback(self, interaction: Interaction):
-        self.view.current_page = int(self.values[0])
-
-        await self.view.update_children(interaction)
+        await self.view.go_to(interaction, int(self.values[0]))
 
 
 class _view(View):
     def __init__(
-        self, author: User, pages: List[SelectOption], embeded: bool, timeout: int = 60
+        self, author: User, source: PageSource, embeded: bool, timeout: int = 60
     ):
         super().__init__(timeout=timeout)
         self.author = author
-        self.pages = pages
+        self.source = source
         self.embeded = embeded
+        self.select: Optional[_select] = None
 
         self.current_page = 0
 
@@ -64,17 +163,45 @@ class _view(View):
     async def on_timeout(self):
         self.stop()
 
-    async def update_children(self, interaction: Interaction):
-        self.next.disabled = self.current_page + 1 == len(self.pages)
+    def add_quick_navigation(self):
+        self.select = _select(self.options())
+        self.add_item(self.select)
+
+    def options(self) -> List[SelectOption]:
+        return [
+            SelectOption(
+                label=f"Page {index+1}",
+                value=str(index),
+                default=index == self.current_page,
+            )
+            for index in self.source.window(self.current_page)
+        ]
+
+    def refresh_children(self):
+        count = self.source.count
+        self.next.disabled = count is not None and self.current_page + 1 >= count
         self.previous.disabled = self.current_page <= 0
-        self.last.disabled = self.next.disabled
+        # Can't jump to the end before knowing where it is
+        self.last.disabled = self.next.disabled or count is None
         self.first.disabled = self.previous.disabled
+        if self.select is not None:
+            self.select.options = self.options()
 
-        kwargs = (
-            {"content": self.pages[self.current_page]}
-            if not (self.embeded)
-            else {"embed": self.pages[self.current_page]}
-        )
+    async def go_to(self, interaction: Interaction, index: int):
+        page = await self.source.get_page(index)
+        if page is not None:
+            self.current_page = index
+        else:
+            page = await self.source.get_page(self.current_page)
+
+        await self.update_children(interaction, page)
+
+    async def update_children(self, interaction: Interaction, page=None):
+        self.refresh_children()
+
+        if page is None:
+            page = await self.source.get_page(self.current_page)
+        kwargs = {"content": page} if not (self.embeded) else {"embed": page}
         kwargs["view"] = self
 
         await interaction.response.edit_message(**kwargs)
@@ -83,15 +210,11 @@ class _view(View):
         style=ButtonStyle.gray, row=1, emoji="<:tgk_backforward:1088526999288565833>"
     )
     async def first(self, interaction: Interaction, button: Button):
-        self.current_page = 0
-
-        await self.update_children(interaction)
+        await self.go_to(interaction, 0)
 
     @button(style=ButtonStyle.gray, row=1, emoji="<:tgk_leftarrow:1088526575781285929>")
     async def previous(self, interaction: Interaction, button: Button):
-        self.current_page -= 1
-
-        await self.update_children(interaction)
+        await self.go_to(interaction, self.current_page - 1)
 
     @button(
         style=ButtonStyle.gray,
@@ -100,11 +223,8 @@ class _view(View):
         emoji="<:tgk_stop:1088526796221317150>",
     )
     async def quit(self, interaction: Interaction, button: Button):
-        kwargs = (
-            {"content": self.pages[self.current_page]}
-            if not (self.embeded)
-            else {"embed": self.pages[self.current_page]}
-        )
+        page = await self.source.get_page(self.current_page)
+        kwargs = {"content": page} if not (self.embeded) else {"embed": page}
 
         for button in self.children:
             button.disabled = True
@@ -118,24 +238,222 @@ class _view(View):
         style=ButtonStyle.gray, row=1, emoji="<:tgk_rightarrow:1088526714205917325>"
     )
     async def next(self, interaction: Interaction, button: Button):
-        self.current_page += 1
-
-        await self.update_children(interaction)
+        await self.go_to(interaction, self.current_page + 1)
 
     @button(
         style=ButtonStyle.gray, row=1, emoji="<:tgk_frontforward:1088526942422180003>"
     )
     async def last(self, interaction: Interaction, button: Button):
-        self.current_page = len(self.pages) - 1
+        await self.go_to(interaction, self.source.count - 1)
+
+
+def register_source(name: str, factory: SourceFactory) -> None:
+    """Let persistent paginators named `name` rebuild their source with `factory`.
+
+    Parameters
+    -----------
+            'name' - A short word, it is stored in every custom_id.
+            'factory' - An async callable taking the owner's id, the page shown
+                and that page's state, returning the PageSource or None if the
+                list is gone.
+    """
+    _sources[name] = factory
+
+
+def unregister_source(name: str) -> None:
+    _sources.pop(name, None)
+
+
+def _custom_id(
+    prefix: str, name: str, owner: int, page: int, action: str, state: str
+) -> str:
+    return f"{prefix}:{name}:{encode_id(owner)}:{page}:{action}:{state}"
+
+
+_TEMPLATE = (
+    r":(?P<name>\w+):(?P<owner>\w+):(?P<page>\d+):(?P<action>\w+):(?P<state>[\w.]*)"
+)
+
+
+class PageButton(DynamicItem[Button], template=r"pg" + _TEMPLATE):
+    """A persistent paginator button, everything it needs is in its custom_id."""
+
+    def __init__(
+        self,
+        name: str,
+        owner: int,
+        page: int,
+        action: str,
+        state: str = "",
+        disabled: bool = False,
+    ):
+        super().__init__(
+            Button(
+                style=ButtonStyle.gray,
+                row=1,
+                emoji=_EMOJIS[action],
+                disabled=disabled,
+                custom_id=_custom_id("pg", name, owner, page, action, state),
+            )
+        )
+        self.name = name
+        self.owner = owner
+        self.page = page
+        self.action = action
+        self.state = state
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: Interaction, item: Button, match: re.Match
+    ) -> "PageButton":
+        return cls(
+            match["name"],
+            decode_id(match["owner"]),
+            int(match["page"]),
+            match["action"],
+            match["state"],
+        )
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        return interaction.user.id == self.owner
+
+    async def callback(self, interaction: Interaction):
+        await _navigate(
+            interaction, self.name, self.owner, self.page, self.action, self.state
+        )
 
-        await self.update_children(interaction)
+
+class PageSelect(DynamicItem[Select], template=r"pgs" + _TEMPLATE):
+    """Persistent quick navigation, the chosen page is the option's value."""
+
+    def __init__(
+        self,
+        name: str,
+        owner: int,
+        page: int,
+        state: str = "",
+        options: Optional[List[SelectOption]] = None,
+    ):
+        super().__init__(
+            Select(
+                placeholder="Quick navigation",
+                min_values=1,
+                max_values=1,
+                options=options or [SelectOption(label="Page 1", value="0")],
+                row=0,
+                custom_id=_custom_id("pgs", name, owner, page, "g", state),
+            )
+        )
+        self.name = name
+        self.owner = owner
+        self.page = page
+        self.state = state
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: Interaction, item: Select, match: re.Match
+    ) -> "PageSelect":
+        return cls(
+            match["name"],
+            decode_id(match["owner"]),
+            int(match["page"]),
+            match["state"],
+        )
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        return interaction.user.id == self.owner
+
+    async def callback(self, interaction: Interaction):
+        await _navigate(
+            interaction,
+            self.name,
+            self.owner,
+            self.page,
+            "g",
+            self.state,
+            int(self.item.values[0]),
+        )
+
+
+def _persistent_view(
+    name: str, owner: int, source: PageSource, page: int, quick_navigation: bool
+) -> View:
+    view = View(timeout=None)
+    state = source.state(page)
+    at_end = source.count is not None and page + 1 >= source.count
+    disabled = {
+        "f": page <= 0,
+        "p": page <= 0,
+        "q": False,
+        "n": at_end,
+        "l": at_end or source.count is None,
+    }
+    for action, off in disabled.items():
+        view.add_item(PageButton(name, owner, page, action, state, off))
+    if quick_navigation:
+        options = [
+            SelectOption(
+                label=f"Page {index+1}", value=str(index), default=index == page
+            )
+            for index in source.window(page)
+        ]
+        view.add_item(PageSelect(name, owner, page, state, options))
+    return view
+
+
+def _page_kwargs(page: Any) -> Dict[str, Any]:
+    return {"embed": page} if isinstance(page, Embed) else {"content": page}
+
+
+async def _navigate(
+    interaction: Interaction,
+    name: str,
+    owner: int,
+    page: int,
+    action: str,
+    state: str,
+    target: Optional[int] = None,
+):
+    if action == "q":
+        return await interaction.response.edit_message(view=None)
+
+    factory = _sources.get(name)
+    source = await factory(owner, page, state) if factory is not None else None
+    if source is None:
+        return await interaction.response.edit_message(
+            content="This list is no longer available", embed=None, view=None
+        )
+
+    if action == "f":
+        target = 0
+    elif action == "p":
+        target = page - 1
+    elif action == "n":
+        target = page + 1
+    elif action == "l" and source.count is not None:
+        target = source.count - 1
+
+    rendered = await source.get_page(target) if target is not None else None
+    if rendered is None:
+        target = page
+        rendered = await source.get_page(page)
+    # Keep quick navigation if the message had it
+    quick_navigation = any(
+        isinstance(child, SelectMenu)
+        for row in interaction.message.components
+        for child in getattr(row, "children", ())
+    )
+    await interaction.response.edit_message(
+        **_page_kwargs(rendered),
+        view=_persistent_view(name, owner, source, target, quick_navigation),
+    )
 
 
 class Paginator:
     def __init__(
         self,
         interaction: Interaction,
-        pages: list,
+        pages: Union[list, PageSource],
         custom_children: Optional[List[Union[Button, Select]]] = [],
     ):
         self.custom_children = custom_children
@@ -150,6 +468,7 @@ class Paginator:
         hidden: bool = True,
         deffered: bool = False,
         edit: bool = False,
+        persistent: Optional[str] = None,
     ) -> None:
         """Starts the paginator.
 
@@ -161,18 +480,35 @@ class Paginator:
                 'hidden' - Whether the paginator is visible to everyone or just the user who initiated it.
                 'deffered' - Whether to use deffered responses or not.
                 'edit' - Whether to edit the original message or not.
+                'persistent' - The name a source factory is registered under with
+                    register_source. The paginator then keeps its state in the
+                    buttons' custom_ids and returns once sent, it never times
+                    out and survives restarts. 'custom_children' and 'timeout'
+                    are ignored.
 
         Raises
         -------
-                'Missing pages' - an empty list was passed to 'pages'.
+                'Missing pages' - 'pages' doesn't have a first page.
                 'ValueError' - Cannot use deffered and edit at the same time.
         """
         if deffered and edit:
             raise ValueError("Cannot use deffered and edit at the same time")
-        if not (self.pages):
+        source = (
+            self.pages
+            if isinstance(self.pages, PageSource)
+            else PageSource.from_list(self.pages)
+        )
+        page = await source.get_page(0)
+        if page is None:
             raise ValueError("Missing pages")
 
-        view = _view(self.interaction.user, self.pages, embeded, timeout)
+        if persistent is not None:
+            view = _persistent_view(
+                persistent, self.interaction.user.id, source, 0, quick_navigation
+            )
+            return await self._send(page, view, embeded, hidden, deffered, edit)
+
+        view = _view(self.interaction.user, source, embeded, timeout)
 
         if len(self.custom_children) == 5:
             for index, button in enumerate(view.children):
@@ -202,25 +538,25 @@ class Paginator:
                 button.row = self.custom_children[index].row
                 button.disabled = self.custom_children[index].disabled
 
-        view.previous.disabled = True if (view.current_page <= 0) else False
-        view.next.disabled = (
-            True if (view.current_page + 1 >= len(self.pages)) else False
-        )
-        view.last.disabled = view.next.disabled
-        view.first.disabled = view.previous.disabled
-
         if quick_navigation:
-            options = []
-            for index, page in enumerate(self.pages):
-                options.append(SelectOption(label=f"Page {index+1}", value=index))
+            view.add_quick_navigation()
+        view.refresh_children()
 
-            view.add_item(_select(options))
+        await self._send(page, view, embeded, hidden, deffered, edit)
 
-        kwargs = (
-            {"content": self.pages[view.current_page]}
-            if not (embeded)
-            else {"embed": self.pages[view.current_page]}
-        )
+        await view.wait()
+
+        for button in view.children:
+            button.disabled = True
+        try:
+            await self.interaction.edit_original_response(view=view)
+        except Exception:
+            pass
+
+    async def _send(
+        self, page, view: View, embeded: bool, hidden: bool, deffered: bool, edit: bool
+    ) -> None:
+        kwargs = {"content": page} if not (embeded) else {"embed": page}
         kwargs["view"] = view
         kwargs["ephemeral"] = hidden
 
@@ -234,21 +570,12 @@ class Paginator:
         else:
             await self.interaction.response.send_message(**kwargs)
 
-        await view.wait()
-
-        for button in view.children:
-            button.disabled = True
-        try:
-            await self.interaction.edit_original_response(view=view)
-        except Exception:
-            pass
-
 
 class Contex_Paginator:
     def __init__(
         self,
         interaction: commands.Context,
-        pages: list,
+        pages: Union[list, PageSource],
         custom_children: Optional[List[Union[Button, Select]]] = [],
         dm: bool = False,
     ):
@@ -269,12 +596,18 @@ class Contex_Paginator:
 
         Raises
         -------
-                'Missing pages' - an empty list was passed to 'pages'.
+                'Missing pages' - 'pages' doesn't have a first page.
         """
-        if not (self.pages):
+        source = (
+            self.pages
+            if isinstance(self.pages, PageSource)
+            else PageSource.from_list(self.pages)
+        )
+        page = await source.get_page(0)
+        if page is None:
             raise ValueError("Missing pages")
 
-        view = _view(self.interaction.author, self.pages, embeded)
+        view = _view(self.interaction.author, source, embeded)
 
         if len(self.custom_children) == 5:
             for index, button in enumerate(view.children):
@@ -304,25 +637,11 @@ class Contex_Paginator:
                 button.row = self.custom_children[index].row
                 button.disabled = self.custom_children[index].disabled
 
-        view.previous.disabled = True if (view.current_page <= 0) else False
-        view.next.disabled = (
-            True if (view.current_page + 1 >= len(self.pages)) else False
-        )
-        view.last.disabled = view.next.disabled
-        view.first.disabled = view.previous.disabled
-
         if quick_navigation:
-            options = []
-            for index, page in enumerate(self.pages):
-                options.append(SelectOption(label=f"Page {index+1}", value=index))
-
-            view.add_item(_select(options))
+            view.add_quick_navigation()
+        view.refresh_children()
 
-        kwargs = (
-            {"content": self.pages[view.current_page]}
-            if not (embeded)
-            else {"embed": self.pages[view.current_page]}
-        )
+        kwargs = {"content": page} if not (embeded) else {"embed": page}
         kwargs["view"] = view
 
         if self.dm:
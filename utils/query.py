@@ -0,0 +1,134 @@
+"""
+Evaluates MongoDB filters, projections, sorts and updates on plain
+dicts, for the storage backends that don't run on a MongoDB server.
+
+Only top level fields are supported, with the query operators
+``$lt``, ``$lte``, ``$gt``, ``$gte``, ``$ne``, ``$in``, ``$nin``,
+``$exists``, ``$and`` and ``$or``, and the update operators
+``$set``, ``$unset``, ``$inc`` and ``$setOnInsert``.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+__all__ = [
+    "is_operator",
+    "matches",
+    "project",
+    "sort_documents",
+    "apply_update",
+    "upsert_document",
+]
+
+UPDATE_OPERATORS = {"$set", "$unset", "$inc", "$setOnInsert"}
+
+
+def _compare(op):
+    def check(present, value, arg):
+        if not present or value is None:
+            return False
+        try:
+            return op(value, arg)
+        except TypeError:
+            return False
+
+    return check
+
+
+OPERATORS = {
+    "$lt": _compare(lambda value, arg: value < arg),
+    "$lte": _compare(lambda value, arg: value <= arg),
+    "$gt": _compare(lambda value, arg: value > arg),
+    "$gte": _compare(lambda value, arg: value >= arg),
+    "$ne": lambda present, value, arg: value != arg,
+    "$in": lambda present, value, arg: value in arg,
+    "$nin": lambda present, value, arg: value not in arg,
+    "$exists": lambda present, value, arg: present == bool(arg),
+}
+
+
+def is_operator(condition: Any) -> bool:
+    """Whether `condition` is an operator expression like ``{"$gt": 1}``."""
+    return (
+        isinstance(condition, dict)
+        and bool(condition)
+        and all(key.startswith("$") for key in condition)
+    )
+
+
+def matches(document: Dict[str, Any], filter_dict: Dict[str, Any]) -> bool:
+    for key, condition in filter_dict.items():
+        if key == "$and":
+            if not all(matches(document, f) for f in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(document, f) for f in condition):
+                return False
+            continue
+
+        present = key in document
+        value = document.get(key)
+        if is_operator(condition):
+            for op, arg in condition.items():
+                if op not in OPERATORS:
+                    raise NotImplementedError(f"Unsupported query operator {op}")
+                if not OPERATORS[op](present, value, arg):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def project(
+    document: Dict[str, Any], projection: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    if not projection:
+        return dict(document)
+
+    include = [key for key, value in projection.items() if value and key != "_id"]
+    if include or projection.get("_id"):
+        result = {key: document[key] for key in include if key in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+
+    return {key: value for key, value in document.items() if key not in projection}
+
+
+def sort_documents(
+    documents: List[Dict[str, Any]], sort: List[Tuple[str, int]]
+) -> None:
+    """Sort in place like MongoDB, missing and null values first."""
+    for field, direction in reversed(sort):
+        documents.sort(
+            key=lambda d: (0, None) if d.get(field) is None else (1, d[field]),
+            reverse=direction < 0,
+        )
+
+
+def apply_update(document: Dict[str, Any], update: Dict[str, Dict[str, Any]]) -> None:
+    """Apply update operators to `document` in place."""
+    unsupported = set(update) - UPDATE_OPERATORS
+    if unsupported:
+        raise NotImplementedError(f"Unsupported update operators {unsupported}")
+
+    for key, value in update.get("$set", {}).items():
+        document[key] = value
+    for key, value in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + value
+    for key in update.get("$unset", {}):
+        document.pop(key, None)
+
+
+def upsert_document(
+    filter_dict: Dict[str, Any], update: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """The document an upsert inserts when nothing matched `filter_dict`."""
+    document = {
+        key: value
+        for key, value in filter_dict.items()
+        if not key.startswith("$") and not is_operator(value)
+    }
+    document.update(update.get("$setOnInsert", {}))
+    apply_update(document, update)
+    return document
@@ -0,0 +1,197 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple
+
+from utils.models import Reminder
+
+
+class ReminderScheduler:
+    """
+    An in-memory min-heap of reminders keyed by their due time.
+
+    The heap is loaded once from the database and then kept in
+    sync by whoever writes reminders, so knowing when the next
+    reminder is due costs nothing between deliveries. Only the
+    ``id``, ``time`` and ``user`` of each reminder need to be set.
+    Removed or rescheduled reminders are dropped lazily when they
+    reach the top of the heap.
+
+    Parameters
+    ----------
+    max_sleep: Optional[float]
+        The longest :meth:`wait` may sleep, for when reminders
+        can also become due without going through this scheduler
+    """
+
+    def __init__(self, max_sleep: Optional[float] = None):
+        self.max_sleep = max_sleep
+        self._heap: List[Tuple[datetime.datetime, int, Any]] = []
+        self._entries: Dict[Any, Reminder] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, reminder_id: Any) -> bool:
+        return reminder_id in self._entries
+
+    async def load(self, reminders: AsyncIterable[Reminder]) -> None:
+        """
+        Replace the schedule with the given reminders.
+
+        Parameters
+        ----------
+        reminders: AsyncIterable[Reminder]
+            Reminders, each with an ``id`` and ``time``,
+            streamed so they are never all held twice
+        """
+        self._entries = {reminder.id: reminder async for reminder in reminders}
+        self._heap = [
+            (reminder.time, next(self._counter), reminder.id)
+            for reminder in self._entries.values()
+        ]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def add(self, reminder: Reminder) -> None:
+        """
+        Schedule a reminder, replacing any entry with the same ``id``.
+
+        Parameters
+        ----------
+        reminder: Reminder
+            The reminder to schedule
+        """
+        head = self.next_due()
+        self._entries[reminder.id] = reminder
+        heapq.heappush(self._heap, (reminder.time, next(self._counter), reminder.id))
+        if head is None or reminder.time < head:
+            self._wakeup.set()
+
+    def reschedule(self, reminder_id: Any, time: datetime.datetime) -> None:
+        """
+        Move a reminder to a new due time, keeping
+        the rest of its scheduled entry.
+
+        Parameters
+        ----------
+        reminder_id: Any
+            The ``_id`` of the reminder
+        time: datetime.datetime
+            When the reminder is now due
+        """
+        reminder = self._entries.get(reminder_id)
+        if reminder is None:
+            reminder = Reminder(reminder_id)
+        # The heap entry for the old time goes stale with this
+        reminder.time = time
+        self.add(reminder)
+
+    def remove(self, reminder_id: Any) -> Optional[Reminder]:
+        """
+        Unschedule a reminder.
+
+        Parameters
+        ----------
+        reminder_id: Any
+            The ``_id`` of the reminder
+
+        Returns
+        -------
+        Optional[Reminder]
+            The reminder that was removed, if it was scheduled
+        """
+        return self._entries.pop(reminder_id, None)
+
+    def remove_many(self, reminder_ids: Iterable[Any]) -> None:
+        for reminder_id in reminder_ids:
+            self._entries.pop(reminder_id, None)
+
+    def next_due(self) -> Optional[datetime.datetime]:
+        """The due time of the earliest scheduled reminder, if any."""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime.datetime) -> List[Reminder]:
+        """
+        Remove and return every reminder due at or before ``now``.
+
+        Parameters
+        ----------
+        now: datetime.datetime
+            The current time, naive UTC like the stored reminders
+
+        Returns
+        -------
+        List[Reminder]
+            The due reminders, earliest first
+        """
+        due = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, reminder_id = heapq.heappop(self._heap)
+            due.append(self._entries.pop(reminder_id))
+
+    def upcoming(self, until: datetime.datetime) -> List[Reminder]:
+        """
+        Every scheduled reminder due at or before `until`,
+        without removing them. Only walks the part of the
+        heap that is due, so this is cheap for short windows.
+
+        Parameters
+        ----------
+        until: datetime.datetime
+            The end of the window, naive UTC
+
+        Returns
+        -------
+        List[Reminder]
+            The reminders in the window, in no particular order
+        """
+        heap = self._heap
+        found, stack = [], [0] if heap else []
+        while stack:
+            index = stack.pop()
+            due, _, reminder_id = heap[index]
+            if due > until:
+                continue
+
+            reminder = self._entries.get(reminder_id)
+            if reminder is not None and reminder.time == due:
+                found.append(reminder)
+            stack.extend(i for i in (2 * index + 1, 2 * index + 2) if i < len(heap))
+        return found
+
+    async def wait(self) -> None:
+        """
+        Sleep until the earliest reminder is due,
+        or until the schedule gains an earlier reminder.
+        """
+        self._wakeup.clear()
+        next_due = self.next_due()
+        timeout = self.max_sleep
+        if next_due is not None:
+            timeout = (next_due - datetime.datetime.utcnow()).total_seconds()
+            if timeout <= 0:
+                return
+            if self.max_sleep is not None:
+                timeout = min(timeout, self.max_sleep)
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _discard_stale(self) -> None:
+        heap = self._heap
+        while heap:
+            due, _, reminder_id = heap[0]
+            reminder = self._entries.get(reminder_id)
+            if reminder is not None and reminder.time == due:
+                return
+            heapq.heappop(heap)
@@ -0,0 +1,732 @@
+"""
+A SQLite backed stand-in for the parts of a motor database that
+utils.db.Document uses, for single node deployments and local runs.
+
+Each collection is a table of BSON encoded documents keyed by _id.
+Fields covered by ``create_index`` get a column of their own with a
+SQLite index on it, and filters on those fields are pushed down to
+SQL. Every row SQL returns is still checked with :func:`matches`,
+so results are exactly those MongoDB would return for the query
+operators utils.query supports. Indexed fields should hold scalars.
+
+All SQLite calls run on one dedicated thread. Writes go through one
+connection in autocommit mode and each cursor reads through a
+connection of its own, so with WAL journaling a cursor that is read
+slowly neither blocks writes nor holds other reads to an old snapshot.
+"""
+
+import asyncio
+import datetime
+import json
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+from utils.query import (
+    apply_update,
+    is_operator,
+    matches,
+    project,
+    sort_documents,
+    upsert_document,
+)
+
+__all__ = ["SQLiteDatabase", "SQLiteCollection", "SQLiteCursor"]
+
+# Mirrors the server, which sends 101 documents in its first batch
+FIRST_BATCH_SIZE = 101
+_RANGE_OPERATORS = {"$lt": "<", "$lte": "<=", "$gt": ">", "$gte": ">="}
+
+
+def _key(value: Any) -> Any:
+    """
+    The SQL value stored for a field: numbers and strings as they
+    are, datetimes as sortable ISO text and anything else as ``None``.
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, datetime.datetime):
+        # BSON keeps milliseconds, so must the column
+        value = value.replace(microsecond=value.microsecond // 1000 * 1000)
+        return value.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return None
+
+
+def _bound(op: str, value: Any) -> Any:
+    """
+    The SQL value for a range bound, datetimes rounded to the
+    millisecond the way that keeps every matching row selected.
+    """
+    if isinstance(value, datetime.datetime) and op in ("$lt", "$gte"):
+        rest = value.microsecond % 1000
+        if rest:
+            value += datetime.timedelta(microseconds=1000 - rest)
+    return _key(value)
+
+
+def _id_key(value: Any) -> Any:
+    key = _key(value)
+    return bson.encode({"_id": value}) if key is None else key
+
+
+def _column(field: str) -> str:
+    return '"f_' + field.replace('"', '""') + '"'
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteDatabase:
+    """
+    Parameters
+    ----------
+    path: str
+        The database file, created if it doesn't exist
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sqlite"
+        )
+        self._writer: Optional[sqlite3.Connection] = None
+        self._collections: Dict[str, SQLiteCollection] = {}
+        self.stats = {"round_trips": 0, "examined": 0}
+
+    def __getitem__(self, name: str) -> "SQLiteCollection":
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+
+    def reset_stats(self) -> None:
+        self.stats = {"round_trips": 0, "examined": 0}
+
+    async def run(self, func, *args) -> Any:
+        """Run `func(*args)` on the SQLite thread."""
+        self.stats["round_trips"] += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    def run_later(self, func, *args) -> None:
+        """Run `func(*args)` on the SQLite thread without waiting for it."""
+        self._executor.submit(func, *args)
+
+    def close(self) -> None:
+        def close():
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+        self._executor.submit(close).result()
+        self._executor.shutdown()
+
+    # Only ever called on the SQLite thread
+    @property
+    def writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = sqlite3.connect(self.path, isolation_level=None)
+            self._writer.execute("PRAGMA journal_mode=WAL")
+            self._writer.execute("PRAGMA synchronous=NORMAL")
+        return self._writer
+
+    def connect(self) -> sqlite3.Connection:
+        """A connection to read through, to be closed after use."""
+        if self.path == ":memory:":
+            return self.writer
+        return sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+
+    def release(self, connection: sqlite3.Connection) -> None:
+        if connection is not self._writer:
+            connection.close()
+
+
+class SQLiteCursor:
+    """Quacks like a motor cursor, fetching rows in batches."""
+
+    def __init__(self, collection, filter_dict, projection=None, **kwargs):
+        self._collection = collection
+        self._filter = filter_dict or {}
+        self._projection = projection
+        self._sort = kwargs.get("sort")
+        self._skip = kwargs.get("skip", 0)
+        self._limit = kwargs.get("limit", 0)
+        self._batch_size = kwargs.get("batch_size", 0)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._rows: Optional[Iterator[Dict[str, Any]]] = None
+        self._buffer: deque = deque()
+        self._skipped = 0
+        self._returned = 0
+        self._exhausted = False
+
+    def __del__(self):
+        # A cursor dropped before it was read to the end
+        if self._connection is not None:
+            try:
+                self._collection.database.run_later(self._close)
+            except RuntimeError:
+                pass
+
+    def sort(self, key, direction: int = 1):
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        self._batch_size = batch_size
+        return self
+
+    async def explain(self) -> Dict[str, Any]:
+        return await self._collection.database.run(self._explain)
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = []
+        while not length or len(results) < length:
+            if not self._buffer:
+                if self._exhausted:
+                    break
+                await self._fetch(length - len(results) if length else 0)
+            while self._buffer and (not length or len(results) < length):
+                results.append(self._buffer.popleft())
+        return results
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        while not self._buffer:
+            if self._exhausted:
+                raise StopAsyncIteration
+            await self._fetch(
+                self._batch_size or (FIRST_BATCH_SIZE if self._rows is None else 0)
+            )
+        return self._buffer.popleft()
+
+    async def _fetch(self, size: int) -> None:
+        """Read up to `size` more documents, every remaining one for 0."""
+        self._buffer.extend(await self._collection.database.run(self._read, size))
+
+    # <-- Runs on the SQLite thread -->
+    def _query(self) -> Tuple[str, List[Any], bool]:
+        """The SQL to run and whether it already sorts the rows."""
+        collection = self._collection
+        where, params = collection._where(self._filter)
+        sql = f"SELECT document FROM {_quote(collection.name)}"
+        if where:
+            sql += f" WHERE {where}"
+
+        sorted_in_sql = False
+        if self._sort:
+            columns = [collection._sql_field(field) for field, _ in self._sort]
+            if all(columns):
+                sorted_in_sql = True
+                sql += " ORDER BY " + ", ".join(
+                    f"{column} {'DESC' if direction < 0 else 'ASC'}"
+                    for column, (_, direction) in zip(columns, self._sort)
+                )
+        return sql, params, sorted_in_sql
+
+    def _read(self, size: int) -> List[Dict[str, Any]]:
+        database = self._collection.database
+        if self._rows is None:
+            sql, params, sorted_in_sql = self._query()
+            self._connection = database.connect()
+            rows = self._matching(self._connection.execute(sql, params))
+            if self._sort and not sorted_in_sql:
+                # Sorting needs every matching row, so read them all now
+                documents = list(rows)
+                sort_documents(documents, self._sort)
+                self._rows = iter(documents)
+                self._close()
+            elif self._connection is database.writer:
+                # Writes on the same connection would disturb a pending read
+                self._rows = iter(list(rows))
+                self._close()
+            else:
+                self._rows = rows
+
+        batch = []
+        for document in self._rows:
+            if self._skipped < self._skip:
+                self._skipped += 1
+                continue
+            batch.append(project(document, self._projection))
+            self._returned += 1
+            if self._limit and self._returned >= self._limit:
+                self._exhausted = True
+                break
+            if size and len(batch) >= size:
+                break
+        else:
+            self._exhausted = True
+        if self._exhausted:
+            self._close()
+        return batch
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._collection.database.release(self._connection)
+            self._connection = None
+
+    def _matching(self, rows: Iterable[Tuple[bytes]]) -> Iterator[Dict[str, Any]]:
+        stats = self._collection.database.stats
+        for (data,) in rows:
+            stats["examined"] += 1
+            document = bson.decode(data)
+            if matches(document, self._filter):
+                yield document
+
+    def _explain(self) -> Dict[str, Any]:
+        sql, params, sorted_in_sql = self._query()
+        database = self._collection.database
+        connection = database.connect()
+        try:
+            details = [
+                row[-1]
+                for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            ]
+        finally:
+            database.release(connection)
+        scan = any(
+            detail.split()[:2] == ["SCAN", self._collection.name]
+            and "INDEX" not in detail
+            for detail in details
+        )
+        plan: Dict[str, Any] = {
+            "stage": "COLLSCAN" if scan else "IXSCAN",
+            "details": details,
+        }
+        if not scan:
+            plan = {"stage": "FETCH", "inputStage": plan}
+        if self._sort and not sorted_in_sql:
+            plan = {"stage": "SORT", "inputStage": plan}
+        return {"queryPlanner": {"winningPlan": plan}}
+
+
+class SQLiteCollection:
+    def __init__(self, database: SQLiteDatabase, name: str):
+        self.database = database
+        self.name = name
+        self._columns: Optional[List[str]] = None
+
+    # <-- Reads -->
+    def find(self, filter_dict=None, projection=None, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self, filter_dict, projection, **kwargs)
+
+    async def find_one(self, filter_dict=None, projection=None, **kwargs):
+        kwargs.pop("limit", None)
+        results = await self.find(filter_dict, projection, limit=1, **kwargs).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, filter_dict: Dict[str, Any], **kwargs) -> int:
+        return len(await self.find(filter_dict, {"_id": 1}).to_list(None))
+
+    # <-- Writes -->
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        await self.database.run(self._transaction, self._insert, document)
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(
+        self, documents: List[Dict[str, Any]], ordered: bool = True, **kwargs
+    ) -> InsertManyResult:
+        for document in documents:
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+        await self.bulk_write(
+            [_Request("insert", document=d) for d in documents], ordered=ordered
+        )
+        return InsertManyResult([d["_id"] for d in documents], True)
+
+    async def update_one(self, filter_dict, update, upsert=False, **kwargs):
+        return await self.database.run(
+            self._transaction, self._update, filter_dict, update, upsert, False
+        )
+
+    async def update_many(self, filter_dict, update, upsert=False, **kwargs):
+        return await self.database.run(
+            self._transaction, self._update, filter_dict, update, upsert, True
+        )
+
+    async def delete_one(self, filter_dict, **kwargs) -> DeleteResult:
+        return await self.database.run(
+            self._transaction, self._delete, filter_dict, False
+        )
+
+    async def delete_many(self, filter_dict, **kwargs) -> DeleteResult:
+        return await self.database.run(
+            self._transaction, self._delete, filter_dict, True
+        )
+
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs):
+        requests = [_Request.from_operation(r) for r in requests]
+        result = await self.database.run(
+            self._transaction, self._bulk_write, requests, ordered
+        )
+        # Raised only once committed, the requests that
+        # succeeded have landed just as they would on a server
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        del result["writeErrors"]
+        return BulkWriteResult(result, True)
+
+    async def create_index(self, keys, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        return await self.database.run(self._create_index, list(keys), kwargs)
+
+    async def create_indexes(self, models, **kwargs) -> List[str]:
+        names = []
+        for model in models:
+            options = dict(model.document)
+            keys = list(options.pop("key").items())
+            names.append(await self.create_index(keys, **options))
+        return names
+
+    def watch(self, *args, **kwargs):
+        raise NotImplementedError("SQLite has no change streams")
+
+    # <-- Runs on the SQLite thread -->
+    @property
+    def columns(self) -> List[str]:
+        """The fields with a column of their own."""
+        self._ensure_table()
+        return self._columns
+
+    def _ensure_table(self) -> None:
+        if self._columns is not None:
+            return
+
+        writer = self.database.writer
+        writer.execute(
+            f"CREATE TABLE IF NOT EXISTS {_quote(self.name)} "
+            "(_id PRIMARY KEY, document BLOB NOT NULL)"
+        )
+        self._columns = [
+            row[1][2:]
+            for row in writer.execute(f"PRAGMA table_info({_quote(self.name)})")
+            if row[1].startswith("f_")
+        ]
+
+    def _sql_field(self, field: str) -> Optional[str]:
+        if field == "_id":
+            return "_id"
+        return _column(field) if field in self.columns else None
+
+    def _where(self, filter_dict: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """
+        A SQL condition matching at least every row the filter
+        matches, built from the conditions on _id and indexed fields.
+        """
+        clauses, params = [], []
+        for field, condition in filter_dict.items():
+            if field in ("$and", "$or"):
+                parts = [self._where(f) for f in condition]
+                if field == "$or" and not all(sql for sql, _ in parts):
+                    continue
+                parts = [(sql, p) for sql, p in parts if sql]
+                if parts:
+                    joiner = " AND " if field == "$and" else " OR "
+                    clauses.append(
+                        "(" + joiner.join(f"({sql})" for sql, _ in parts) + ")"
+                    )
+                    params.extend(p for _, part in parts for p in part)
+                continue
+
+            column = self._sql_field(field)
+            if column is None:
+                continue
+            encode = _id_key if field == "_id" else _key
+            if not is_operator(condition):
+                if _key(condition) is not None or field == "_id":
+                    clauses.append(f"{column} = ?")
+                    params.append(encode(condition))
+                continue
+
+            for op, arg in condition.items():
+                if op in _RANGE_OPERATORS and _key(arg) is not None:
+                    clauses.append(f"{column} {_RANGE_OPERATORS[op]} ?")
+                    params.append(_bound(op, arg))
+                elif op == "$in" and all(
+                    _key(v) is not None or field == "_id" for v in arg
+                ):
+                    keys = [encode(v) for v in arg]
+                    if any(isinstance(k, bytes) for k in keys):
+                        marks = ", ".join("?" * len(keys))
+                        clauses.append(f"{column} IN ({marks})")
+                        params.extend(keys)
+                    else:
+                        # One parameter however long the list is
+                        clauses.append(
+                            f"{column} IN (SELECT value FROM json_each(?))"
+                        )
+                        params.append(json.dumps(keys))
+        return " AND ".join(clauses), params
+
+    def _transaction(self, func, *args) -> Any:
+        self._ensure_table()
+        writer = self.database.writer
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+        except BaseException:
+            writer.execute("ROLLBACK")
+            raise
+        writer.execute("COMMIT")
+        return result
+
+    def _select(self, filter_dict: Dict[str, Any], many: bool) -> List[Dict[str, Any]]:
+        where, params = self._where(filter_dict)
+        sql = f"SELECT document FROM {_quote(self.name)}"
+        if where:
+            sql += f" WHERE {where}"
+        documents = []
+        for (data,) in self.database.writer.execute(sql, params):
+            self.database.stats["examined"] += 1
+            document = bson.decode(data)
+            if matches(document, filter_dict):
+                documents.append(document)
+                if not many:
+                    break
+        return documents
+
+    def _row(self, document: Dict[str, Any]) -> List[Any]:
+        return [bson.encode(document)] + [
+            _key(document.get(field)) for field in self.columns
+        ]
+
+    def _insert(self, document: Dict[str, Any]) -> None:
+        columns = "".join(f", {_column(f)}" for f in self.columns)
+        marks = ", ?" * len(self.columns)
+        try:
+            self.database.writer.execute(
+                f"INSERT INTO {_quote(self.name)} (_id, document{columns}) "
+                f"VALUES (?, ?{marks})",
+                [_id_key(document["_id"])] + self._row(document),
+            )
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate_key(document, e) from None
+
+    def _replace(self, document: Dict[str, Any]) -> None:
+        assignments = "".join(f", {_column(f)} = ?" for f in self.columns)
+        try:
+            self.database.writer.execute(
+                f"UPDATE {_quote(self.name)} SET document = ?{assignments} "
+                "WHERE _id = ?",
+                self._row(document) + [_id_key(document["_id"])],
+            )
+        except sqlite3.IntegrityError as e:
+            raise self._duplicate_key(document, e) from None
+
+    def _duplicate_key(
+        self, document: Dict[str, Any], error: sqlite3.IntegrityError
+    ) -> DuplicateKeyError:
+        # SQLite names the columns, e.g. "UNIQUE constraint failed:
+        # items.f_a, items.f_b", find the unique index made of them
+        prefix = self.name + "."
+        columns = [
+            column.strip()[len(prefix) :]
+            for column in str(error).partition(":")[2].split(",")
+        ]
+        index, pattern = "_id_", {"_id": 1}
+        writer = self.database.writer
+        for row in writer.execute(f"PRAGMA index_list({_quote(self.name)})"):
+            name, unique = row[1], row[2]
+            if not unique or not name.startswith(prefix):
+                continue
+            keys = [
+                (info[2], -1 if info[3] else 1)
+                for info in writer.execute(f"PRAGMA index_xinfo({_quote(name)})")
+                if info[5]
+            ]
+            if [column for column, _ in keys] == columns:
+                index = name[len(prefix) :]
+                pattern = {
+                    column if column == "_id" else column[2:]: direction
+                    for column, direction in keys
+                }
+                break
+
+        value = {field: document.get(field) for field in pattern}
+        message = (
+            f"E11000 duplicate key error collection: {self.name} "
+            f"index: {index} dup key: {value!r}"
+        )
+        return DuplicateKeyError(
+            message,
+            11000,
+            {
+                "code": 11000,
+                "errmsg": message,
+                "keyPattern": pattern,
+                "keyValue": value,
+            },
+        )
+
+    def _update(self, filter_dict, update, upsert, many) -> UpdateResult:
+        documents = self._select(filter_dict, many)
+        if not documents and upsert:
+            document = upsert_document(filter_dict, update)
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            self._insert(document)
+            return UpdateResult(
+                {"n": 1, "nModified": 0, "upserted": document["_id"]}, True
+            )
+
+        for document in documents:
+            _id = document["_id"]
+            apply_update(document, update)
+            if document.get("_id") != _id:
+                raise WriteError("The _id field is immutable", 66)
+            self._replace(document)
+        return UpdateResult({"n": len(documents), "nModified": len(documents)}, True)
+
+    def _delete(self, filter_dict, many) -> DeleteResult:
+        ids = [_id_key(d["_id"]) for d in self._select(filter_dict, many)]
+        self.database.writer.executemany(
+            f"DELETE FROM {_quote(self.name)} WHERE _id = ?", [(i,) for i in ids]
+        )
+        return DeleteResult({"n": len(ids)}, True)
+
+    def _bulk_write(
+        self, requests: List["_Request"], ordered: bool
+    ) -> Dict[str, Any]:
+        result = {
+            "nInserted": 0,
+            "nUpserted": 0,
+            "nMatched": 0,
+            "nModified": 0,
+            "nRemoved": 0,
+            "upserted": [],
+            "writeErrors": [],
+        }
+        for index, request in enumerate(requests):
+            writer = self.database.writer
+            writer.execute("SAVEPOINT request")
+            try:
+                if request.kind == "insert":
+                    self._insert(request.document)
+                    result["nInserted"] += 1
+                elif request.kind == "update":
+                    outcome = self._update(
+                        request.filter, request.update, request.upsert, request.many
+                    )
+                    if outcome.upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append(
+                            {"index": index, "_id": outcome.upserted_id}
+                        )
+                    else:
+                        result["nMatched"] += outcome.matched_count
+                        result["nModified"] += outcome.modified_count
+                else:
+                    result["nRemoved"] += self._delete(
+                        request.filter, request.many
+                    ).deleted_count
+            except (DuplicateKeyError, WriteError) as e:
+                writer.execute("ROLLBACK TO request")
+                writer.execute("RELEASE request")
+                details = e.details or {"code": e.code, "errmsg": str(e)}
+                result["writeErrors"].append({"index": index, **details})
+                if ordered:
+                    break
+            else:
+                writer.execute("RELEASE request")
+        return result
+
+    def _create_index(self, keys: List[Tuple[str, int]], options: Dict[str, Any]):
+        writer = self.database.writer
+        for field, _ in keys:
+            if field == "_id" or field in self.columns:
+                continue
+            table = _quote(self.name)
+            writer.execute(f"ALTER TABLE {table} ADD COLUMN {_column(field)}")
+            rows = writer.execute(f"SELECT _id, document FROM {table}").fetchall()
+            writer.executemany(
+                f"UPDATE {table} SET {_column(field)} = ? WHERE _id = ?",
+                [(_key(bson.decode(data).get(field)), _id) for _id, data in rows],
+            )
+            self.columns.append(field)
+
+        name = options.get("name") or "_".join(f"{k}_{d}" for k, d in keys)
+        columns = ", ".join(
+            f"{self._sql_field(field)} {'DESC' if direction < 0 else 'ASC'}"
+            for field, direction in keys
+        )
+        unique = "UNIQUE " if options.get("unique") else ""
+        writer.execute(
+            f"CREATE {unique}INDEX IF NOT EXISTS {_quote(self.name + '.' + name)} "
+            f"ON {_quote(self.name)} ({columns})"
+        )
+        return name
+
+
+class _Request:
+    """A bulk write request, read out of a pymongo operation."""
+
+    __slots__ = ("kind", "filter", "document", "update", "upsert", "many")
+
+    def __init__(
+        self,
+        kind: str,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        document: Optional[Dict[str, Any]] = None,
+        update: Optional[Dict[str, Any]] = None,
+        upsert: bool = False,
+        many: bool = False,
+    ):
+        self.kind = kind
+        self.filter = filter_dict
+        self.document = document
+        self.update = update
+        self.upsert = upsert
+        self.many = many
+
+    @classmethod
+    def from_operation(cls, operation: Any) -> "_Request":
+        if isinstance(operation, cls):
+            return operation
+
+        kind = type(operation).__name__
+        if kind == "InsertOne":
+            document = operation._doc
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            return cls("insert", document=document)
+        if kind in ("UpdateOne", "UpdateMany"):
+            return cls(
+                "update",
+                operation._filter,
+                update=operation._doc,
+                upsert=bool(operation._upsert),
+                many=kind == "UpdateMany",
+            )
+        if kind in ("DeleteOne", "DeleteMany"):
+            return cls("delete", operation._filter, many=kind == "DeleteMany")
+        raise NotImplementedError(f"Unsupported bulk write operation {kind}")
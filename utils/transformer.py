@@ -1,6 +1,9 @@
 import discord
 from discord import app_commands
 import re
+from typing import Tuple
+
+from utils.ids import MAX_ID, decode_id
 
 time_regex = re.compile("(?:(\d{1,5})(h|s|m|d))+?")
 time_dict = {"h": 3600, "s": 1, "m": 60, "d": 86400}
@@ -23,3 +26,26 @@ class TimeConverter(app_commands.Transformer):
             except ValueError:
                 raise ValueError
         return time
+
+
+class ReminderIdConverter(app_commands.Transformer):
+    """
+    The ids a reminder code may stand for, the decoded code first.
+    All digit codes may also be the numeric ids reminders had
+    before codes, which older confirmation messages still show.
+    """
+
+    async def transform(
+        self, interaction: discord.Interaction, argument: str
+    ) -> Tuple[int, ...]:
+        reminder_ids = []
+        reminder_id = decode_id(argument)
+        if reminder_id is not None:
+            reminder_ids.append(reminder_id)
+        argument = argument.strip()
+        if argument.isdecimal() and int(argument) <= MAX_ID:
+            if int(argument) not in reminder_ids:
+                reminder_ids.append(int(argument))
+        if not reminder_ids:
+            raise ValueError(f"`{argument}` is not a reminder ID")
+        return tuple(reminder_ids)
@@ -0,0 +1,244 @@
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from utils.events import DeleteEvent, DocumentEvent, InsertEvent, UpdateEvent
+from utils.models import Reminder
+
+__all__ = ["UserReminderIndex", "search_reminders"]
+
+# Enough of a message to recognise it in a suggestion
+PREVIEW_LENGTH = 60
+# Writes a load can catch up on, a load that missed more starts over
+REPLAY_LENGTH = 1024
+# The fields suggestions show or are owned by
+_INDEXED_FIELDS = {"user", "time", "message"}
+
+
+def search_reminders(
+    reminders: Iterable[Reminder], text: str = "", limit: int = 25
+) -> List[Reminder]:
+    """
+    The reminders, soonest first, whose code starts with
+    `text` or whose message contains it, ignoring case.
+    """
+    text = text.strip().casefold()
+    code = text.upper().replace("-", "")
+    found = [
+        reminder
+        for reminder in reminders
+        if not text
+        or reminder.code.startswith(code)
+        or text in (reminder.message or "").casefold()
+    ]
+    found.sort(key=lambda reminder: (reminder.time is None, reminder.time))
+    return found[:limit]
+
+
+class UserReminderIndex:
+    """
+    The ids, times and message previews of the reminders of
+    recently active users, for suggestions and ownership checks
+    that don't need a database read.
+
+    A user's reminders are loaded as a whole the first time they
+    are needed and then kept up to date from the reminders
+    Document's write events, see :meth:`apply`. Writes that land
+    while a user's reminders are being read are replayed onto
+    them once loaded. The least recently used users are dropped
+    past `maxsize`.
+
+    Parameters
+    ----------
+    maxsize: int
+        The most users to hold reminders for
+    ttl: Optional[float]
+        Seconds a user's reminders are trusted for, bounding how
+        stale they get when other processes write without change
+        streams. ``None`` trusts them until evicted.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._users: "OrderedDict[int, Dict[Any, Reminder]]" = OrderedDict()
+        self._loaded_at: Dict[int, float] = {}
+        # Which loaded user each reminder belongs to, as
+        # delete events only carry the reminder's _id
+        self._owners: Dict[Any, int] = {}
+        # Bumped on every write to the indexed fields, which are
+        # kept in _writes for loads that were reading meanwhile
+        self.generation = 0
+        self._writes: Deque[Tuple[int, DocumentEvent]] = deque(
+            maxlen=REPLAY_LENGTH
+        )
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return self._get(user_id) is not None
+
+    def load(
+        self,
+        user_id: int,
+        reminders: Iterable[Reminder],
+        generation: Optional[int] = None,
+    ) -> bool:
+        """
+        Replace what is held for `user_id` with their `reminders`,
+        read at `generation`, then replay the writes made since.
+        Returns whether they were kept, they aren't if a write
+        since can't be replayed.
+        """
+        missed = []
+        if generation is not None and generation != self.generation:
+            if not self._writes or self._writes[0][0] > generation + 1:
+                # More writes than we remember
+                return False
+            missed = [event for number, event in self._writes if number > generation]
+            if any(_unreplayable(user_id, event) for event in missed):
+                return False
+
+        self.forget(user_id)
+        self._users[user_id] = {}
+        self._loaded_at[user_id] = time.monotonic()
+        for reminder in reminders:
+            self._add(user_id, reminder)
+        for event in missed:
+            self._replay(user_id, event)
+
+        while len(self._users) > self.maxsize:
+            self.forget(next(iter(self._users)))
+        return True
+
+    def forget(self, user_id: int) -> None:
+        for reminder_id in self._users.pop(user_id, {}):
+            self._owners.pop(reminder_id, None)
+        self._loaded_at.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._loaded_at.clear()
+        self._owners.clear()
+
+    def owns(self, user_id: int, reminder_id: Any) -> Optional[bool]:
+        """
+        Whether `user_id` has a reminder with this _id,
+        ``None`` if their reminders aren't loaded.
+        """
+        reminders = self._get(user_id)
+        if reminders is None:
+            return None
+        return reminder_id in reminders
+
+    def search(
+        self, user_id: int, text: str = "", limit: int = 25
+    ) -> Optional[List[Reminder]]:
+        """
+        The user's reminders matching `text`, see :func:`search_reminders`,
+        ``None`` if their reminders aren't loaded.
+        """
+        reminders = self._get(user_id)
+        if reminders is None:
+            return None
+        return search_reminders(reminders.values(), text, limit)
+
+    def apply(self, event: DocumentEvent) -> None:
+        """Keep the loaded users in step with a write to the reminders."""
+        if isinstance(event, UpdateEvent):
+            if not {*event.fields, *event.removed} & _INDEXED_FIELDS:
+                return
+        elif not isinstance(event, (InsertEvent, DeleteEvent)):
+            return
+        self.generation += 1
+        self._writes.append((self.generation, event))
+
+        if isinstance(event, InsertEvent):
+            for document in event.documents:
+                if document.get("user") in self._users:
+                    self._add(document["user"], Reminder(**document))
+        elif isinstance(event, DeleteEvent):
+            if event.ids is None:
+                self.clear()
+                return
+            for reminder_id in event.ids:
+                self._remove(reminder_id)
+        elif isinstance(event, UpdateEvent):
+            if event.ids is None:
+                self.clear()
+                return
+            for reminder_id in event.ids:
+                self._update(reminder_id, event)
+
+    def _replay(self, user_id: int, event: DocumentEvent) -> None:
+        """Apply a write the reminders just loaded for `user_id` may predate."""
+        reminders = self._users[user_id]
+        if isinstance(event, InsertEvent):
+            for document in event.documents:
+                if document.get("user") == user_id:
+                    self._add(user_id, Reminder(**document))
+        elif isinstance(event, DeleteEvent):
+            for reminder_id in event.ids:
+                if reminder_id in reminders:
+                    self._remove(reminder_id)
+        else:
+            for reminder_id in event.ids:
+                if reminder_id in reminders:
+                    self._update(reminder_id, event)
+
+    def _get(self, user_id: int) -> Optional[Dict[Any, Reminder]]:
+        reminders = self._users.get(user_id)
+        if reminders is None:
+            return None
+        if self.ttl is not None:
+            if time.monotonic() - self._loaded_at[user_id] > self.ttl:
+                self.forget(user_id)
+                return None
+        self._users.move_to_end(user_id)
+        return reminders
+
+    def _add(self, user_id: int, reminder: Reminder) -> None:
+        if reminder.message and len(reminder.message) > PREVIEW_LENGTH:
+            reminder.message = reminder.message[: PREVIEW_LENGTH - 1] + "…"
+        self._users[user_id][reminder.id] = reminder
+        self._owners[reminder.id] = user_id
+
+    def _remove(self, reminder_id: Any) -> None:
+        user_id = self._owners.pop(reminder_id, None)
+        if user_id is not None:
+            self._users[user_id].pop(reminder_id, None)
+
+    def _update(self, reminder_id: Any, event: UpdateEvent) -> None:
+        user_id = self._owners.get(reminder_id)
+        if "user" in event.fields or "user" in event.removed:
+            self._remove(reminder_id)
+            new_owner = event.fields.get("user")
+            if new_owner in self._users:
+                # The rest of the reminder isn't known here
+                self.forget(new_owner)
+            return
+
+        if user_id is None:
+            return
+
+        reminder = self._users[user_id][reminder_id]
+        if "time" in event.fields:
+            reminder.time = event.fields["time"]
+        if "message" in event.fields:
+            reminder.message = event.fields["message"]
+            self._add(user_id, reminder)
+        if "time" in event.removed:
+            reminder.time = None
+        if "message" in event.removed:
+            reminder.message = None
+
+
+def _unreplayable(user_id: int, event: DocumentEvent) -> bool:
+    """Whether `event` may change `user_id`'s reminders in a way replay can't."""
+    if isinstance(event, InsertEvent):
+        return False
+    if event.ids is None:
+        return True
+    # Reminders moved to the user arrive without their other fields
+    return isinstance(event, UpdateEvent) and event.fields.get("user") == user_id